@@ -0,0 +1,67 @@
+"""
+Throughput benchmark for the depth based object localization.
+
+Run from the repository root with::
+
+    PYTHONPATH=src python benchmarks/depth_localization.py --width 1920 --height 1080 --objects 30
+"""
+import argparse
+import time
+
+import numpy as np
+from cltl.backend.api.camera import Image
+
+from objectref.objectloc.depth import DepthObjectReference
+
+
+def synthetic_frame(width: int, height: int, rng: np.random.Generator) -> Image:
+    rgb = np.zeros((height, width, 3), dtype=np.uint8)
+    depth = rng.integers(500, 5000, size=(height, width), dtype=np.uint16)
+    # Invalid measurements as reported by most depth sensors
+    depth[rng.random((height, width)) < 0.05] = 0
+
+    return Image(rgb, (0, 0, 1, 1), depth)
+
+
+def synthetic_boxes(width: int, height: int, count: int, rng: np.random.Generator):
+    x0 = rng.integers(0, width - 50, size=count)
+    y0 = rng.integers(0, height - 50, size=count)
+    x1 = np.minimum(x0 + rng.integers(20, width // 3, size=count), width)
+    y1 = np.minimum(y0 + rng.integers(20, height // 3, size=count), height)
+
+    return [tuple(box) for box in np.stack((x0, y0, x1, y1), axis=1).tolist()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark DepthObjectReference.get_locations")
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--objects", type=int, default=30, help="Detections per frame")
+    parser.add_argument("--frames", type=int, default=500)
+    parser.add_argument("--samples", type=int, default=16, help="Depth samples per box and axis")
+    parser.add_argument("--rate", type=float, default=30.0, help="Camera rate to compare against")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    frame = synthetic_frame(args.width, args.height, rng)
+    boxes = [synthetic_boxes(args.width, args.height, args.objects, rng) for _ in range(16)]
+    object_reference = DepthObjectReference(depth_scale=0.001, samples=args.samples)
+
+    object_reference.get_locations(frame, boxes[0])
+
+    durations = []
+    for i in range(args.frames):
+        start = time.perf_counter()
+        object_reference.get_locations(frame, boxes[i % len(boxes)])
+        durations.append(time.perf_counter() - start)
+
+    durations = np.array(durations) * 1000
+    fps = 1000 / durations.mean()
+    print(f"{args.width}x{args.height}, {args.objects} objects/frame, {args.frames} frames")
+    print(f"latency ms: mean {durations.mean():.3f}, p50 {np.percentile(durations, 50):.3f}, "
+          f"p99 {np.percentile(durations, 99):.3f}")
+    print(f"throughput: {fps:.0f} frames/s ({fps / args.rate:.1f}x camera rate of {args.rate:.0f} fps)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,400 @@
+"""
+Load test of the services on an in-process event bus.
+
+Each service is started on its own :class:`SynchronousEventBus` and driven with synthetic
+image, object and text events at the given rate, images are served by a fake image source.
+For each service the throughput, the latency from publishing an event until the service
+finished processing it, and the number of events that were dropped without being processed
+are reported. For the object reference service an image and its detections are one unit of
+work, which is finished when the joined frame is processed, and the drops reported by the
+metrics of the services are listed by reason.
+
+Run from the repository root with::
+
+    PYTHONPATH=src python benchmarks/load_test.py --rate 30 --duration 5 --services objectref monitoring
+"""
+import argparse
+import logging
+import random
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from cltl.backend.api.camera import Image
+from cltl.backend.spi.image import ImageSource
+from cltl.combot.event.bdi import DesireEvent, Intention, IntentionEvent
+from cltl.combot.event.emissor import AnnotationEvent, ImageSignalEvent, TextSignalEvent
+from cltl.combot.infra.event import Event
+from cltl.combot.infra.event.memory import SynchronousEventBus
+from cltl.combot.infra.time_util import timestamp_now
+from cltl.commons.language_data.sentences import GOODBYE, GREETING
+from cltl.object_recognition.api import Object
+from emissor.representation.scenario import Annotation, ImageSignal, Mention, MultiIndex, TextSignal, class_type
+
+from cltl_service.bdi.service import BDIService
+from cltl_service.context.service import ContextService
+from cltl_service.intentions.init import InitService
+from cltl_service.keyword.service import KeywordService
+from cltl_service.metrics.registry import MetricsRegistry
+from cltl_service.monitoring.service import MonitoringService
+from objectref.objectloc.depth import DepthObjectReference
+from objectref_service.objectloc.service import ObjectReferenceService
+
+SCENARIO_ID = "load-test"
+LABELS = ["cup", "chair", "person", "book", "laptop", "bottle", "plant", "table"]
+
+TOPICS = {
+    "image_topic": "cltl.topic.image",
+    "object_topic": "cltl.topic.object",
+    "text_in_topic": "cltl.topic.text_in",
+    "text_out_topic": "cltl.topic.text_out",
+    "scenario_topic": "cltl.topic.scenario",
+    "speaker_topic": "cltl.topic.speaker",
+    "intention_topic": "cltl.topic.intention",
+    "desire_topic": "cltl.topic.desire",
+}
+
+
+class FakeImageSource(ImageSource):
+    def __init__(self, image: Image):
+        self._image = image
+
+    def capture(self) -> Image:
+        return self._image
+
+
+class FakeEmissorClient:
+    def get_current_scenario_id(self):
+        return SCENARIO_ID
+
+
+@dataclass
+class Detection:
+    # The services only use the label of detected objects
+    label: str
+    confidence: float = 1.0
+
+
+class Recorder:
+    """
+    Records when events are published and when the service finished processing them.
+    """
+
+    def __init__(self):
+        self._published: Dict[str, float] = dict()
+        self._units = 0
+        self._latencies: List[float] = []
+        self._lock = threading.Lock()
+
+    def publish(self, event_bus, topic: str, payload, unit: bool = True):
+        """
+        Publish an event, `unit` is False for events that are processed together with another event.
+        """
+        event = Event.for_payload(payload)
+        with self._lock:
+            self._published[event.id] = time.perf_counter()
+            self._units += unit
+        event_bus.publish(topic, event)
+
+    def complete(self, event_id: str):
+        """
+        Record that the unit of work that was completed by the event is processed.
+        """
+        with self._lock:
+            published = self._published.get(event_id)
+            if published:
+                self._latencies.append(time.perf_counter() - published)
+
+    @property
+    def published(self) -> int:
+        return self._units
+
+    @property
+    def processed(self) -> int:
+        return len(self._latencies)
+
+    @property
+    def latencies(self) -> np.ndarray:
+        with self._lock:
+            return np.array(self._latencies) * 1000
+
+
+class Frames:
+    def __init__(self, width: int, height: int, objects: int):
+        rng = np.random.default_rng(0)
+        rgb = rng.integers(0, 255, size=(height, width, 3), dtype=np.uint8)
+        depth = rng.integers(500, 5000, size=(height, width), dtype=np.uint16)
+        self.image = Image(rgb, (0, 0, 1, 1), depth)
+
+        self._width, self._height, self._objects = width, height, objects
+        self._rng = random.Random(0)
+
+    def load(self, url) -> ImageSource:
+        return FakeImageSource(self.image)
+
+    def image_payload(self, image_id: str):
+        signal = ImageSignal.for_scenario(SCENARIO_ID, timestamp_now(), timestamp_now(), f"fake://{image_id}",
+                                          (0, 0, self._width, self._height), signal_id=image_id)
+
+        return ImageSignalEvent.create(signal)
+
+    def object_payload(self, image_id: str):
+        mentions = []
+        for _ in range(self._objects):
+            x0, y0 = self._rng.randrange(self._width - 50), self._rng.randrange(self._height - 50)
+            bounds = (x0, y0, min(x0 + self._rng.randrange(20, 400), self._width),
+                      min(y0 + self._rng.randrange(20, 400), self._height))
+            annotation = Annotation(class_type(Object), Detection(self._rng.choice(LABELS)), "load-test",
+                                    timestamp_now())
+            mentions.append(Mention(str(uuid.uuid4()), [MultiIndex(image_id, bounds)], [annotation]))
+
+        return AnnotationEvent.create(mentions)
+
+
+class TimedService:
+    """
+    Mixin that records events as completed when the service processed them.
+    """
+    recorder: Recorder = None
+
+    def _process(self, event):
+        super()._process(event)
+        if event is not None:
+            self.recorder.complete(event.id)
+
+
+class TimedBDIService(TimedService, BDIService):
+    pass
+
+
+class TimedContextService(TimedService, ContextService):
+    pass
+
+
+class TimedKeywordService(TimedService, KeywordService):
+    pass
+
+
+class TimedInitService(TimedService, InitService):
+    pass
+
+
+class TimedObjectReferenceService(ObjectReferenceService):
+    """
+    Records a frame as completed when the joined frame is processed, with the event that
+    completed the frame in the join buffer.
+    """
+    recorder: Recorder = None
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._joined: "OrderedDict[int, Tuple[object, str]]" = OrderedDict()
+        self._joined_lock = threading.Lock()
+
+    def _process(self, event):
+        super()._process(event)
+        if event.metadata.topic == self._text_in_topic:
+            self.recorder.complete(event.id)
+
+    def _update_image(self, event):
+        return self._joined_by(super()._update_image(event), event)
+
+    def _update_objects(self, event):
+        return self._joined_by(super()._update_objects(event), event)
+
+    def _joined_by(self, joined, event):
+        if joined:
+            with self._joined_lock:
+                self._joined[id(joined)] = (joined, event.id)
+
+        return joined
+
+    def _process_frame(self, joined):
+        super()._process_frame(joined)
+
+        # Frames are processed in order, earlier frames were superseded
+        with self._joined_lock:
+            while self._joined:
+                key, (_, event_id) = self._joined.popitem(last=False)
+                if key == id(joined):
+                    self.recorder.complete(event_id)
+                    break
+
+
+class TimedMonitoringService(MonitoringService):
+    recorder: Recorder = None
+
+    def _process(self, event):
+        super()._process(event)
+        if event.metadata.topic in (self._text_in_topic, self._text_out_topic):
+            self.recorder.complete(event.id)
+
+    def _process_frame_event(self, event):
+        super()._process_frame_event(event)
+        self.recorder.complete(event.id)
+
+
+def text_payload(text: str):
+    return TextSignalEvent.for_speaker(TextSignal.for_scenario(SCENARIO_ID, timestamp_now(), timestamp_now(), None, text))
+
+
+def frame_events(frames: Frames, tick: int) -> List[Tuple[str, object]]:
+    image_id = str(uuid.uuid4())
+    events = [(TOPICS["image_topic"], frames.image_payload(image_id)),
+              (TOPICS["object_topic"], frames.object_payload(image_id))]
+    if tick % 30 == 0:
+        events.append((TOPICS["text_in_topic"], text_payload("Where is the cup?")))
+
+    return events
+
+
+def chat_events(tick: int) -> List[Tuple[str, object]]:
+    if tick % 10 == 0:
+        return [(TOPICS["text_in_topic"], text_payload(random.choice(GOODBYE)))]
+    if tick % 10 == 5:
+        return [(TOPICS["text_in_topic"], text_payload(random.choice(GREETING) + " yes"))]
+
+    return [(TOPICS["text_in_topic"], text_payload(f"Tell me something about topic {tick}"))]
+
+
+@dataclass
+class LoadTest:
+    service: object
+    activation: List[Tuple[str, object]]
+    events: Callable[[int], List[Tuple[str, object]]]
+    # Topic of events that are processed as one unit of work with the event that follows them
+    joined_topic: Optional[str] = None
+
+
+def object_reference_test(event_bus, frames: Frames, args, metrics: MetricsRegistry) -> LoadTest:
+    service = TimedObjectReferenceService(TOPICS["image_topic"], TOPICS["object_topic"],
+                                          TOPICS["text_in_topic"], TOPICS["text_out_topic"],
+                                          frames.load, DepthObjectReference(depth_scale=0.001), FakeEmissorClient(),
+                                          event_bus, None, latest_only=args.latest_only, metrics=metrics)
+
+    return LoadTest(service, [], lambda tick: frame_events(frames, tick), TOPICS["image_topic"])
+
+
+def monitoring_test(event_bus, frames: Frames, args, metrics: MetricsRegistry) -> LoadTest:
+    service = TimedMonitoringService(TOPICS["image_topic"], TOPICS["object_topic"],
+                                     TOPICS["text_in_topic"], TOPICS["text_out_topic"],
+                                     frames.load, event_bus, None, latest_only=args.latest_only, metrics=metrics)
+    # Monitoring only processes events while it is viewed
+    service.app.test_client().get("/text")
+
+    return LoadTest(service, [], lambda tick: frame_events(frames, tick))
+
+
+def context_test(event_bus, frames: Frames, args, metrics: MetricsRegistry) -> LoadTest:
+    service = TimedContextService(TOPICS["scenario_topic"], TOPICS["speaker_topic"], TOPICS["object_topic"],
+                                  TOPICS["intention_topic"], TOPICS["desire_topic"], event_bus, None, metrics=metrics)
+
+    return LoadTest(service, [(TOPICS["intention_topic"], IntentionEvent(["init"]))],
+                    lambda tick: [(TOPICS["object_topic"], frames.object_payload(str(uuid.uuid4())))])
+
+
+def bdi_test(event_bus, frames: Frames, args, metrics: MetricsRegistry) -> LoadTest:
+    model = {"init": {"initialized": ["chat"]}, "chat": {"quit": ["init"]}}
+    service = TimedBDIService(model, TOPICS["scenario_topic"], TOPICS["intention_topic"], TOPICS["desire_topic"],
+                              event_bus, None, metrics=metrics)
+
+    return LoadTest(service, [(TOPICS["intention_topic"], IntentionEvent(["init"]))],
+                    lambda tick: [(TOPICS["desire_topic"], DesireEvent(["quit" if tick % 2 else "initialized"]))])
+
+
+def keyword_test(event_bus, frames: Frames, args, metrics: MetricsRegistry) -> LoadTest:
+    service = TimedKeywordService(TOPICS, FakeEmissorClient(), event_bus, None, metrics=metrics)
+
+    return LoadTest(service, [(TOPICS["intention_topic"], IntentionEvent([Intention("chat", None)]))], chat_events)
+
+
+def init_test(event_bus, frames: Frames, args, metrics: MetricsRegistry) -> LoadTest:
+    service = TimedInitService(TOPICS, "I'm Leolani.", FakeEmissorClient(), event_bus, None, metrics=metrics)
+
+    return LoadTest(service, [(TOPICS["intention_topic"], IntentionEvent([Intention("init", None)]))], chat_events)
+
+
+LOAD_TESTS = {
+    "objectref": object_reference_test,
+    "monitoring": monitoring_test,
+    "context": context_test,
+    "bdi": bdi_test,
+    "keyword": keyword_test,
+    "init": init_test,
+}
+
+
+def run(name: str, args, frames: Frames):
+    event_bus = SynchronousEventBus()
+    recorder = Recorder()
+    metrics = MetricsRegistry()
+    load_test = LOAD_TESTS[name](event_bus, frames, args, metrics)
+    service = load_test.service
+
+    service.recorder = recorder
+    service.start()
+    try:
+        for topic, payload in load_test.activation:
+            event_bus.publish(topic, Event.for_payload(payload))
+        # Let the topic worker process the activation before measuring
+        time.sleep(0.1)
+
+        interval = 1 / args.rate if args.rate else 0
+        start = time.perf_counter()
+        tick = 0
+        while time.perf_counter() - start < args.duration:
+            for topic, payload in load_test.events(tick):
+                recorder.publish(event_bus, topic, payload, unit=topic != load_test.joined_topic)
+            tick += 1
+            if interval:
+                time.sleep(max(0.0, start + tick * interval - time.perf_counter()))
+        elapsed = time.perf_counter() - start
+
+        # Wait for the service to process buffered events
+        processed = -1
+        while processed != recorder.processed:
+            processed = recorder.processed
+            time.sleep(0.5)
+        drops = {dict(labels)["reason"]: value
+                 for _, labels, value in metrics.counter("dropped_total", "").samples() if value}
+    finally:
+        service.stop()
+
+    latencies = recorder.latencies
+    dropped = recorder.published - recorder.processed
+
+    print(f"{name:<12} {recorder.published / elapsed:>9.1f} {recorder.processed / elapsed:>9.1f} "
+          f"{np.percentile(latencies, 50) if len(latencies) else float('nan'):>9.2f} "
+          f"{np.percentile(latencies, 99) if len(latencies) else float('nan'):>9.2f} "
+          f"{dropped:>8}  {', '.join(f'{reason}={count:.0f}' for reason, count in sorted(drops.items()))}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the services on an in-process event bus")
+    parser.add_argument("--services", nargs="+", choices=list(LOAD_TESTS.keys()), default=list(LOAD_TESTS.keys()))
+    parser.add_argument("--rate", type=float, default=30.0, help="Ticks per second, zero for maximum speed")
+    parser.add_argument("--duration", type=float, default=5.0, help="Duration per service in seconds")
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--objects", type=int, default=10, help="Detections per frame")
+    parser.add_argument("--latest-only", action="store_true", help="Drop superseded frames")
+    args = parser.parse_args()
+
+    # Desires and intentions get out of step when events are dropped
+    logging.basicConfig(level=logging.ERROR)
+
+    frames = Frames(args.width, args.height, args.objects)
+
+    print(f"rate {args.rate:.0f}/s, {args.duration:.0f}s per service, {args.width}x{args.height}, "
+          f"{args.objects} objects/frame")
+    print(f"{'service':<12} {'in/s':>9} {'done/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'dropped':>8}  reasons")
+    for name in args.services:
+        run(name, args, frames)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""
+Replay a recorded event log into the object reference service.
+
+Image, object and text events from a log written by the
+:class:`cltl_service.recording.recorder.EventRecorder` are published on an in-process event bus
+at the recorded pace, a multiple of it, or as fast as possible. Images are served from the log.
+The processing time of each event is reported per topic, and optionally the processing
+is profiled.
+
+Run from the repository root with::
+
+    PYTHONPATH=src python benchmarks/replay.py events.log --speed 4 --profile
+"""
+import argparse
+import cProfile
+import pstats
+import time
+from collections import defaultdict
+
+import numpy as np
+from cltl.combot.infra.event.memory import SynchronousEventBus
+from cltl_service.recording.log import EventLogReader
+from cltl_service.recording.replay import EventReplayer
+from objectref.objectloc.depth import DepthObjectReference
+from objectref_service.objectloc.service import ObjectReferenceService
+
+
+class FakeEmissorClient:
+    def get_current_scenario_id(self):
+        return "replay"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay an event log into the object reference service")
+    parser.add_argument("log", help="Event log recorded with the EventRecorder")
+    parser.add_argument("--speed", type=float, default=1.0, help="Replay speed factor, zero for maximum speed")
+    parser.add_argument("--topic-image", default="cltl.topic.image")
+    parser.add_argument("--topic-object", default="cltl.topic.object")
+    parser.add_argument("--topic-text-in", default="cltl.topic.text_in")
+    parser.add_argument("--topic-text-out", default="cltl.topic.text_out")
+    parser.add_argument("--depth-scale", type=float, default=0.001, help="Meters per depth unit")
+    parser.add_argument("--profile", action="store_true", help="Profile the event processing")
+    parser.add_argument("--top", type=int, default=25, help="Number of functions in the profile")
+    args = parser.parse_args()
+
+    event_bus = SynchronousEventBus()
+    with EventLogReader(args.log) as reader:
+        service = ObjectReferenceService(args.topic_image, args.topic_object, args.topic_text_in, args.topic_text_out,
+                                         reader.image_loader, DepthObjectReference(depth_scale=args.depth_scale),
+                                         FakeEmissorClient(), event_bus, None)
+
+        timings = defaultdict(list)
+        profiler = cProfile.Profile() if args.profile else None
+        process = service._process
+
+        def timed_process(event):
+            start = time.perf_counter()
+            if profiler:
+                profiler.enable()
+            try:
+                process(event)
+            finally:
+                if profiler:
+                    profiler.disable()
+                timings[event.metadata.topic].append(time.perf_counter() - start)
+
+        service._process = timed_process
+
+        topics = [args.topic_image, args.topic_object, args.topic_text_in]
+        replayer = EventReplayer(reader, event_bus, speed=args.speed, topics=topics)
+
+        print(f"Replaying {len(reader)} events recorded in {reader.duration:.1f}s at speed {args.speed}")
+        service.start()
+        try:
+            statistics = replayer.replay()
+            # Wait for the service to process buffered events
+            processed = -1
+            while processed != sum(len(t) for t in timings.values()):
+                processed = sum(len(t) for t in timings.values())
+                time.sleep(0.5)
+        finally:
+            service.stop()
+
+    print(f"Published {statistics.events} events in {statistics.duration:.1f}s, "
+          f"max lag {statistics.max_lag * 1000:.1f} ms, processed {processed}")
+    print(f"{'topic':<24} {'events':>8} {'mean ms':>9} {'p50 ms':>9} {'p99 ms':>9}")
+    for topic, durations in timings.items():
+        durations = np.array(durations) * 1000
+        print(f"{topic:<24} {len(durations):>8} {durations.mean():>9.2f} "
+              f"{np.percentile(durations, 50):>9.2f} {np.percentile(durations, 99):>9.2f}")
+
+    if profiler:
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(args.top)
+
+
+if __name__ == '__main__':
+    main()
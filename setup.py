@@ -23,7 +23,7 @@ setup(
     long_description=long_description,
     long_description_content_type="text/markdown",
     python_requires='>=3.7',
-    install_requires=["cltl.object-recognition"],
+    install_requires=["cltl.object-recognition", "numpy"],
     extras_require={
         "impl": [
             "mock",
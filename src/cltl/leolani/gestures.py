@@ -1,5 +1,10 @@
+import functools
+import re
 from dataclasses import dataclass
 from enum import Enum, auto
+from typing import Iterable, Iterator, Set, Tuple
+
+from cltl.leolani.phrases import Phrase, PhraseMatcher, normalize
 
 class GestureType(Enum):
     ABOVE = "above"
@@ -284,6 +289,128 @@ options = [GestureType.ABOVE,
                GestureType.ZERO,
                GestureType.ZESTFUL]
 
+
+_VOWELS = set("aeiou")
+
+# Parts of speech of the single word gestures that are inflected, other gestures only match
+# their value, such that e.g. pronouns and particles (her, all) are not inflected
+_VERBS = {GestureType.AFFORD, GestureType.APPEASE, GestureType.ASSUAGE, GestureType.ATTEMPER, GestureType.BECALM,
+          GestureType.BEG, GestureType.BESEECH, GestureType.BOW, GestureType.CALL, GestureType.CALM,
+          GestureType.CHOOSE, GestureType.CLEAR, GestureType.COGITATE, GestureType.ENTREAT, GestureType.ESTIMATE,
+          GestureType.EXPLAIN, GestureType.GIVE, GestureType.IMPLORE, GestureType.INDICATE, GestureType.MEDITATE,
+          GestureType.MOLLIFY, GestureType.OFFER, GestureType.OPPOSE, GestureType.PACIFY, GestureType.PICK,
+          GestureType.PLACATE, GestureType.PRESENT, GestureType.PROFFER, GestureType.REFUTE, GestureType.REJECT,
+          GestureType.SELECT, GestureType.SHOW, GestureType.SOOTHE, GestureType.SUPPLICATE, GestureType.THINK,
+          GestureType.COOL, GestureType.WARM}
+_NOUNS = {GestureType.CHOICE, GestureType.CLOUD, GestureType.FIELD, GestureType.FLOOR, GestureType.GIFT,
+          GestureType.REASON, GestureType.SKY, GestureType.TABLET, GestureType.WINNER}
+_ADJECTIVES = {GestureType.BASHFUL, GestureType.BLANK, GestureType.CALM, GestureType.CLEAR, GestureType.COOL,
+               GestureType.CRAZY, GestureType.DESPERATE, GestureType.EMPTY, GestureType.ENTHUSIASTIC,
+               GestureType.ENTIRE, GestureType.GENTLE, GestureType.HAPPY, GestureType.HOPELESS,
+               GestureType.HYSTERICAL, GestureType.JOYFUL, GestureType.MODEST, GestureType.NERVOUS,
+               GestureType.PEACEFUL, GestureType.QUIET, GestureType.RAPTUROUS, GestureType.SAD, GestureType.SHY,
+               GestureType.TIMID, GestureType.UNCOMFORTABLE, GestureType.WARM, GestureType.ZESTFUL}
+
+
+def _inflections(word: str, verb: bool = False, noun: bool = False, adjective: bool = False) -> Set[str]:
+    """
+    Regular inflections of a word for its parts of speech, used instead of lemmatizing each
+    token of an utterance.
+    """
+    consonant_y = word.endswith("y") and len(word) > 2 and word[-2] not in _VOWELS
+
+    forms = set()
+    if verb or noun:
+        if consonant_y:
+            forms.add(word[:-1] + "ies")
+        elif word.endswith(("s", "x", "z", "ch", "sh")):
+            forms.add(word + "es")
+        else:
+            forms.add(word + "s")
+    if verb:
+        if consonant_y:
+            forms.update({word + "ing", word[:-1] + "ied"})
+        elif word.endswith("e"):
+            forms.update({word[:-1] + "ing", word + "d"})
+        elif re.fullmatch(r"[^aeiou]*[aeiou][^aeiouwxy]", word):
+            # Single syllable ending in consonant-vowel-consonant, e.g. beg -> begging
+            forms.update({word + word[-1] + "ing", word + word[-1] + "ed"})
+        else:
+            forms.update({word + "ing", word + "ed"})
+    if adjective:
+        if consonant_y and len(word) > 3:
+            forms.add(word[:-1] + "ily")
+        elif word.endswith("le"):
+            forms.add(word[:-1] + "y")
+        elif word.endswith("ic"):
+            forms.add(word + "ally")
+        else:
+            forms.add(word + "ly")
+
+    return forms
+
+
+class GestureAnnotator:
+    """
+    Select gestures for utterances by the words they contain.
+
+    Gestures are indexed once by the words of their value and the regular inflections of
+    single word verbs, nouns and adjectives, such that annotating an utterance is a single
+    pass over its tokens. Results for repeated utterances are served from a bounded LRU cache.
+
+    Examples
+    --------
+    >>> annotator = GestureAnnotator()
+    >>> annotator.annotate("I was thinking about the clouds")
+    (<GestureType.I: 'i'>, <GestureType.THINK: 'think'>, <GestureType.CLOUD: 'cloud'>)
+    >>> annotator.annotate("She is begging, smiling gently")
+    (<GestureType.BEG: 'beg'>, <GestureType.GENTLE: 'gentle'>)
+    >>> annotator.annotate("An ally ate a herring")
+    ()
+    """
+
+    def __init__(self, gestures: Iterable[GestureType] = None, cache_size: int = 1024):
+        """
+        Parameters
+        ----------
+        gestures : Iterable[GestureType]
+            The gestures to select from, defaults to :data:`options`.
+        cache_size : int
+            Maximum number of cached utterances, zero disables caching.
+        """
+        gestures = list(gestures) if gestures is not None else list(options)
+
+        words = {gesture.value for gesture in gestures}
+        phrases = [Phrase(gesture.value, gesture) for gesture in gestures]
+        # Inflections that are a gesture themselves are matched as that gesture only
+        phrases.extend(Phrase(form, gesture)
+                       for gesture in gestures
+                       for form in _inflections(gesture.value, gesture in _VERBS, gesture in _NOUNS,
+                                                gesture in _ADJECTIVES)
+                       if form not in words)
+
+        self._matcher = PhraseMatcher(phrases)
+        self._annotate = functools.lru_cache(maxsize=cache_size)(self._match) if cache_size else self._match
+
+    def annotate(self, utterance: str) -> Tuple[GestureType, ...]:
+        """
+        Gestures for the words in the utterance, in the order in which the words occur.
+        """
+        return self._annotate(utterance)
+
+    def annotate_all(self, utterances: Iterable[str]) -> Iterator[Tuple[GestureType, ...]]:
+        """
+        Gestures for each of a stream of utterances, see :meth:`annotate`.
+        """
+        return map(self._annotate, utterances)
+
+    def cache_info(self):
+        return self._annotate.cache_info() if hasattr(self._annotate, "cache_info") else None
+
+    def _match(self, utterance: str) -> Tuple[GestureType, ...]:
+        return tuple(self._matcher.match(utterance))
+
+
 def main():
     print((GestureType(2)) )
 if __name__ == '__main__':
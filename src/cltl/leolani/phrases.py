@@ -0,0 +1,166 @@
+import json
+import re
+from dataclasses import dataclass
+from typing import Dict, Generic, Iterable, List, Mapping, Set, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+_TOKEN = re.compile(r"[^\W_]+")
+
+
+def normalize(text: str) -> Tuple[str, ...]:
+    """
+    Split text into lower case tokens of letters and digits, ignoring punctuation.
+    """
+    return tuple(_TOKEN.findall(text.lower()))
+
+
+@dataclass(frozen=True)
+class Phrase(Generic[T]):
+    """
+    A phrase to match in an utterance with the value returned for a match.
+
+    If `exact` is set, the phrase only matches the complete utterance, otherwise
+    it matches wherever it occurs in the utterance.
+    """
+    text: str
+    value: T
+    exact: bool = False
+
+
+class PhraseMatcher(Generic[T]):
+    """
+    Match a set of phrases in an utterance in a single pass over its tokens.
+
+    Phrases and utterances are compared after :func:`normalize`. Exact phrases are looked
+    up by their tokens, other phrases are compiled into an Aho-Corasick automaton over
+    tokens, such that matching is linear in the length of the utterance independent of
+    the number of phrases.
+    """
+
+    def __init__(self, phrases: Iterable[Phrase[T]]):
+        self._exact: Dict[Tuple[str, ...], List[T]] = dict()
+
+        self._goto: List[Dict[str, int]] = [dict()]
+        self._output: List[List[T]] = [[]]
+        self._size = 0
+        for phrase in phrases:
+            tokens = normalize(phrase.text)
+            if not tokens:
+                raise ValueError(f"Phrase {phrase.text!r} contains no words")
+
+            if phrase.exact:
+                self._exact.setdefault(tokens, []).append(phrase.value)
+            else:
+                self._add(tokens, phrase.value)
+            self._size += 1
+
+        self._fail = self._link()
+
+    def __len__(self):
+        return self._size
+
+    def _add(self, tokens: Tuple[str, ...], value: T):
+        state = 0
+        for token in tokens:
+            if token not in self._goto[state]:
+                self._goto.append(dict())
+                self._output.append([])
+                self._goto[state][token] = len(self._goto) - 1
+            state = self._goto[state][token]
+
+        self._output[state].append(value)
+
+    def _link(self) -> List[int]:
+        fail = [0] * len(self._goto)
+        queue = list(self._goto[0].values())
+        for state in queue:
+            for token, target in self._goto[state].items():
+                fallback = fail[state]
+                while fallback and token not in self._goto[fallback]:
+                    fallback = fail[fallback]
+                fail[target] = self._goto[fallback].get(token, 0)
+                queue.append(target)
+
+        # Precompute the outputs of all suffixes in breadth first order
+        self._output = [list(output) for output in self._output]
+        for state in queue:
+            self._output[state].extend(self._output[fail[state]])
+
+        return fail
+
+    def match(self, utterance: str) -> List[T]:
+        """
+        Find the values of all phrases that match the utterance.
+
+        Returns
+        -------
+        List[T]
+            The values of matching exact phrases, followed by the values of the other
+            phrases in the order in which they end in the utterance.
+        """
+        tokens = normalize(utterance)
+
+        matches = list(self._exact.get(tokens, ()))
+
+        state = 0
+        for token in tokens:
+            while state and token not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(token, 0)
+            matches.extend(self._output[state])
+
+        return matches
+
+    def first(self, utterance: str, default: T = None) -> T:
+        """
+        The value of the first phrase that matches the utterance, see :meth:`match`.
+        """
+        matches = self.match(utterance)
+
+        return matches[0] if matches else default
+
+
+class PhraseSets:
+    """
+    Named sets of phrases in one or more languages, matched in a single pass.
+
+    Phrase tables map languages to set names and phrases, e.g.::
+
+        {"en": {"greeting": ["Hi", "Hello"], "affirmation": ["yes"]},
+         "nl": {"greeting": ["Hoi", "Hallo"], "affirmation": ["ja"]}}
+
+    The phrases of a set in all selected languages are combined, such that an utterance
+    matches the set in any of the languages.
+    """
+
+    def __init__(self, tables: Mapping[str, Mapping[str, Iterable[str]]], languages: Iterable[str] = None):
+        languages = list(languages) if languages else list(tables.keys())
+        unknown = [language for language in languages if language not in tables]
+        if unknown:
+            raise ValueError("No phrases for languages: " + ", ".join(unknown))
+
+        self._names = frozenset(name for language in languages for name in tables[language])
+        self._matcher = PhraseMatcher(Phrase(phrase, name)
+                                      for language in languages
+                                      for name, phrases in tables[language].items()
+                                      for phrase in phrases)
+
+    @property
+    def names(self) -> frozenset:
+        return self._names
+
+    def match(self, utterance: str) -> Set[str]:
+        """
+        The names of all sets with a phrase that occurs in the utterance.
+        """
+        return set(self._matcher.match(utterance))
+
+    @classmethod
+    def load(cls, path: str, languages: Iterable[str] = None) -> "PhraseSets":
+        """
+        Load phrase tables from a JSON file.
+        """
+        with open(path) as tables_file:
+            return cls(json.load(tables_file), languages)
@@ -0,0 +1,124 @@
+import logging
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class TransitionTable:
+    """
+    BDI model compiled to a table of transitions indexed by intention and achieved desire.
+
+    The BDI model maps each intention to the desires that can be achieved for it, and each
+    desire to the list of intentions that follow when it is achieved::
+
+        {"init": {"initialized": ["chat"]}, "chat": {"quit": ["init"]}}
+    """
+
+    @classmethod
+    def compile(cls, bdi_model: Mapping[str, Mapping[str, Iterable[str]]],
+                initial: Iterable[str] = ()) -> "TransitionTable":
+        """
+        Compile and validate a BDI model.
+
+        Parameters
+        ----------
+        bdi_model : Mapping[str, Mapping[str, Iterable[str]]]
+            The BDI model.
+        initial : Iterable[str]
+            Intentions the agent starts with, if given, intentions that cannot be reached from
+            them are reported.
+
+        Raises
+        ------
+        ValueError
+            If the model is malformed or contains transitions to intentions that are not in the model.
+        """
+        if not isinstance(bdi_model, Mapping):
+            raise ValueError("BDI model must be a mapping from intentions to desires, was " + str(type(bdi_model)))
+
+        transitions = dict()
+        missing = set()
+        for intention, desires in bdi_model.items():
+            if not isinstance(desires, Mapping):
+                raise ValueError(f"Desires for intention {intention} must be a mapping, was {type(desires)}")
+            for desire, targets in desires.items():
+                if isinstance(targets, str):
+                    raise ValueError(f"Transition ({intention}, {desire}) must list intentions, was {targets!r}")
+                targets = tuple(targets)
+                transitions[(intention, desire)] = targets
+                missing.update(target for target in targets if target not in bdi_model)
+
+        if missing:
+            raise ValueError("BDI model contains transitions to undefined intentions: " + ", ".join(sorted(missing)))
+
+        initial = tuple(initial)
+        undefined_initial = set(initial) - set(bdi_model)
+        if undefined_initial:
+            raise ValueError("Initial intentions are not defined in the BDI model: "
+                             + ", ".join(sorted(undefined_initial)))
+
+        table = cls(transitions, bdi_model.keys())
+
+        unreachable = table.unreachable(initial) if initial else set()
+        if unreachable:
+            logger.warning("BDI model contains intentions that are unreachable from %s: %s",
+                           initial, ", ".join(sorted(unreachable)))
+
+        return table
+
+    def __init__(self, transitions: Mapping[Tuple[str, str], Sequence[str]], intentions: Iterable[str]):
+        self._transitions: Dict[Tuple[str, str], Tuple[str, ...]] = {key: tuple(targets)
+                                                                      for key, targets in transitions.items()}
+        self._intentions = frozenset(intentions)
+
+    @property
+    def intentions(self) -> frozenset:
+        return self._intentions
+
+    def targets(self, intention: str, desire: str) -> Optional[Tuple[str, ...]]:
+        """
+        The intentions that follow when the desire is achieved for the intention, None if there is no transition.
+        """
+        return self._transitions.get((intention, desire))
+
+    def transition(self, intentions: Sequence[str], achieved: Iterable[str]) -> Optional[List[str]]:
+        """
+        Apply the achieved desires in order to the intentions.
+
+        A desire is only applied if there is a transition for each of the current intentions,
+        desires without transition are skipped.
+
+        Returns
+        -------
+        Optional[List[str]]
+            The resulting intentions, None if none of the desires could be applied.
+        """
+        applied = False
+        for desire in achieved:
+            targets = [self._transitions.get((intention, desire)) for intention in intentions]
+            if not intentions or any(target is None for target in targets):
+                logger.warning("No transition for desire %s from intentions %s", desire, intentions)
+                continue
+
+            intentions = [intention for target in targets for intention in target]
+            applied = True
+
+        return list(intentions) if applied else None
+
+    def unreachable(self, initial: Iterable[str]) -> set:
+        """
+        Intentions that cannot be reached from the initial intentions.
+        """
+        successors = dict()
+        for (intention, _), targets in self._transitions.items():
+            successors.setdefault(intention, set()).update(targets)
+
+        reached = set(initial)
+        frontier = list(reached)
+        while frontier:
+            for successor in successors.get(frontier.pop(), ()):
+                if successor not in reached:
+                    reached.add(successor)
+                    frontier.append(successor)
+
+        return set(self._intentions) - reached
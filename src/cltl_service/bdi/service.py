@@ -1,10 +1,13 @@
 import logging
+from typing import Union
 
 from cltl.combot.event.bdi import IntentionEvent
 from cltl.combot.infra.config import ConfigurationManager
 from cltl.combot.infra.event import Event, EventBus
 from cltl.combot.infra.resource import ResourceManager
 from cltl.combot.infra.topic_worker import TopicWorker
+from cltl_service.bdi.model import TransitionTable
+from cltl_service.metrics.registry import MetricsRegistry, instrumented, shared_metrics
 
 logger = logging.getLogger(__name__)
 
@@ -24,12 +27,13 @@ class BDIService:
     def from_config(cls, bdi_model: dict, event_bus: EventBus, resource_manager: ResourceManager,
                     config_manager: ConfigurationManager):
         config = config_manager.get_config("cltl.bdi")
+        initial = config.get("initial_intentions", multi=True) if "initial_intentions" in config else ()
 
-        return cls(bdi_model, config.get("topic_scenario"), config.get("topic_intention"), config.get("topic_desire"),
-                   event_bus, resource_manager)
+        return cls(TransitionTable.compile(bdi_model, initial), config.get("topic_scenario"), config.get("topic_intention"), config.get("topic_desire"),
+                   event_bus, resource_manager, metrics=shared_metrics())
 
-    def __init__(self, bdi_model: dict, scenario_topic: str, intention_topic: str, desire_topic: str,
-                 event_bus: EventBus, resource_manager: ResourceManager):
+    def __init__(self, bdi_model: Union[dict, TransitionTable], scenario_topic: str, intention_topic: str, desire_topic: str,
+                 event_bus: EventBus, resource_manager: ResourceManager, metrics: MetricsRegistry = None):
         self._event_bus = event_bus
         self._resource_manager = resource_manager
 
@@ -38,11 +42,12 @@ class BDIService:
         self._desire_topic = desire_topic
 
         self._topic_worker = None
+        self._metrics = metrics
 
         self._scenario = None
         self._intentions = []
 
-        self._bdi = bdi_model
+        self._bdi = bdi_model if isinstance(bdi_model, TransitionTable) else TransitionTable.compile(bdi_model)
 
     @property
     def app(self):
@@ -51,7 +56,8 @@ class BDIService:
     def start(self, timeout=30):
         self._topic_worker = TopicWorker([self._intention_topic, self._desire_topic],
                                          self._event_bus, provides=[self._intention_topic],
-                                         resource_manager=self._resource_manager, processor=self._process,
+                                         resource_manager=self._resource_manager,
+                                         processor=instrumented(self._metrics, self.__class__.__name__, self._process),
                                          name=self.__class__.__name__)
         self._topic_worker.start().wait()
 
@@ -70,11 +76,12 @@ class BDIService:
                     self._intentions = event.payload.intentions
                     logger.info("Set intentions to %s", self._intentions)
             elif event.metadata.topic == self._desire_topic:
-                self._intentions = [intention
-                                    for current_intention in self._intentions
-                                    for achieved in event.payload.achieved
-                                    for intention in self._bdi[current_intention][achieved]]
+                intentions = self._bdi.transition(self._intentions, event.payload.achieved)
+                if intentions is None:
+                    return
+
+                self._intentions = intentions
                 self._event_bus.publish(self._intention_topic, Event.for_payload(IntentionEvent(self._intentions)))
-                logger.info("Achieved %s, set intentions to %s", event.payload.achieved[0], self._intentions)
+                logger.info("Achieved %s, set intentions to %s", event.payload.achieved, self._intentions)
         except:
             logger.exception("Failed to process achieved desire %s for intentions %s", event.payload, self._intentions)
@@ -0,0 +1,37 @@
+from dataclasses import dataclass
+from typing import List, Optional
+
+from cltl.combot.event.emissor import Agent, EmissorEvent, ScenarioEvent
+from emissor.representation.scenario import Scenario
+
+
+@dataclass
+class ScenarioSnapshot(ScenarioEvent):
+    """
+    Full scenario at the given version of its context.
+    """
+    version: int
+
+    @classmethod
+    def create(cls, scenario: Scenario, version: int = 0):
+        return cls(cls.__name__, scenario, version)
+
+
+@dataclass
+class ScenarioContextDelta(EmissorEvent):
+    """
+    Changes of the scenario context since the previous version.
+
+    Fields that did not change are None, `objects` contains only the labels that were
+    added to the objects of the context. A delta applies to the scenario at `version - 1`,
+    receivers that missed a version should wait for the next :class:`ScenarioSnapshot`.
+    """
+    scenario_id: str
+    version: int
+    speaker: Optional[Agent] = None
+    objects: Optional[List[str]] = None
+
+    @classmethod
+    def create(cls, scenario_id: str, version: int, speaker: Optional[Agent] = None,
+               objects: Optional[List[str]] = None):
+        return cls(cls.__name__, scenario_id, version, speaker, objects)
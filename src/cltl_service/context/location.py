@@ -0,0 +1,176 @@
+import abc
+import json
+import logging
+import os
+import threading
+import time
+from typing import Mapping, Optional
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+
+UNKNOWN_LOCATION = {"country": "", "region": "", "city": ""}
+
+
+class LocationResolver(abc.ABC):
+    """
+    Provides the location of the agent.
+
+    :meth:`get_location` must return immediately, resolvers that need network access
+    resolve the location in the background between :meth:`start` and :meth:`stop`.
+    """
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    @abc.abstractmethod
+    def get_location(self) -> dict:
+        """
+        Get the current location.
+
+        Returns
+        -------
+        dict
+            The location with at least `country`, `region` and `city`, with empty values if unknown.
+        """
+        raise NotImplementedError()
+
+
+class StaticLocationResolver(LocationResolver):
+    """
+    Location from the configuration, e.g. for offline deployments.
+    """
+
+    def __init__(self, location: Mapping[str, str] = None):
+        self._location = dict(UNKNOWN_LOCATION, **(location if location else {}))
+
+    def get_location(self) -> dict:
+        return dict(self._location)
+
+
+class IpInfoLocationResolver(LocationResolver):
+    """
+    Location based on the public IP address from ipinfo.io.
+
+    The location is refreshed on a background thread once it is older than `ttl` seconds,
+    requests to the service are aborted after `timeout` seconds. If `cache_file` is given,
+    the last resolved location is stored on disk and used after a restart until it is
+    refreshed. Until a location is available, the `fallback` location is returned.
+    """
+
+    def __init__(self, url: str = "https://ipinfo.io", timeout: float = 2.0, ttl: float = 24 * 3600,
+                 retry_interval: float = 60, cache_file: str = None, fallback: LocationResolver = None):
+        self._url = url
+        self._timeout = timeout
+        self._ttl = ttl
+        self._retry_interval = retry_interval
+        self._cache_file = cache_file
+        self._fallback = fallback if fallback else StaticLocationResolver()
+
+        self._location: Optional[dict] = None
+        self._timestamp = 0.0
+
+        self._stop_event = threading.Event()
+        self._thread = None
+
+        self._load_cache()
+
+    def start(self):
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name=self.__class__.__name__, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=self._timeout + 1)
+            self._thread = None
+
+    def get_location(self) -> dict:
+        location = self._location
+
+        return dict(location) if location else self._fallback.get_location()
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            age = time.time() - self._timestamp
+            if age >= self._ttl:
+                wait = self._ttl if self._refresh() else self._retry_interval
+            else:
+                wait = self._ttl - age
+
+            self._stop_event.wait(wait)
+
+    def _refresh(self) -> bool:
+        try:
+            response = requests.get(self._url, timeout=self._timeout)
+            response.raise_for_status()
+            location = dict(UNKNOWN_LOCATION, **response.json())
+        except Exception as e:
+            logger.warning("Failed to resolve location from %s: %s", self._url, e)
+            return False
+
+        self._location, self._timestamp = location, time.time()
+        self._store_cache()
+        logger.info("Resolved location %s, %s, %s", location["city"], location["region"], location["country"])
+
+        return True
+
+    def _load_cache(self):
+        if not self._cache_file or not os.path.isfile(self._cache_file):
+            return
+
+        try:
+            with open(self._cache_file) as cache:
+                cached = json.load(cache)
+            self._location = dict(UNKNOWN_LOCATION, **cached["location"])
+            self._timestamp = float(cached["timestamp"])
+        except Exception:
+            logger.warning("Ignored invalid location cache %s", self._cache_file, exc_info=True)
+
+    def _store_cache(self):
+        if not self._cache_file:
+            return
+
+        try:
+            directory = os.path.dirname(self._cache_file)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_file = self._cache_file + ".tmp"
+            with open(tmp_file, "w") as cache:
+                json.dump({"timestamp": self._timestamp, "location": self._location}, cache)
+            os.replace(tmp_file, self._cache_file)
+        except OSError:
+            logger.warning("Failed to store location cache %s", self._cache_file, exc_info=True)
+
+
+def location_resolver_from_config(config) -> LocationResolver:
+    """
+    Create the location resolver from the `location_*` settings of the configuration.
+
+    `location_provider` selects either `static`, with the location from `location_country`,
+    `location_region` and `location_city`, or `ipinfo` (default), which falls back to the
+    static location until the location is resolved.
+    """
+    static = StaticLocationResolver({key: config.get("location_" + key)
+                                     for key in ("country", "region", "city") if "location_" + key in config})
+
+    provider = config.get("location_provider") if "location_provider" in config else "ipinfo"
+    if provider == "static":
+        return static
+    if provider != "ipinfo":
+        raise ValueError("Unknown location provider: " + provider)
+
+    options = {key: config.get_float("location_" + key)
+               for key in ("timeout", "ttl", "retry_interval") if "location_" + key in config}
+    if "location_url" in config:
+        options["url"] = config.get("location_url")
+    if "location_cache" in config:
+        options["cache_file"] = config.get("location_cache")
+
+    return IpInfoLocationResolver(fallback=static, **options)
@@ -1,8 +1,9 @@
 import logging
+import time
 import uuid
 from collections import Counter
+from typing import List, Optional
 
-import requests
 from cltl.combot.event.emissor import LeolaniContext, Agent, ScenarioStarted, ScenarioStopped, ScenarioEvent
 from cltl.combot.infra.config import ConfigurationManager
 from cltl.combot.infra.event import Event, EventBus
@@ -10,6 +11,9 @@ from cltl.combot.infra.resource import ResourceManager
 from cltl.combot.infra.time_util import timestamp_now
 from cltl.combot.infra.topic_worker import TopicWorker
 from cltl.object_recognition.api import Object
+from cltl_service.context.events import ScenarioContextDelta, ScenarioSnapshot
+from cltl_service.context.location import LocationResolver, StaticLocationResolver, location_resolver_from_config
+from cltl_service.metrics.registry import MetricsRegistry, instrumented, shared_metrics
 from emissor.representation.scenario import Modality, Scenario, class_type
 
 logger = logging.getLogger(__name__)
@@ -27,14 +31,38 @@ class ContextService:
         object_topic = config.get("topic_object")
         intention_topic = config.get("topic_intention")
         desire_topic = config.get("topic_desire")
+        publish_interval = config.get_float("publish_interval") if "publish_interval" in config else 0
+        delta_updates = config.get_boolean("delta_updates") if "delta_updates" in config else False
+        snapshot_interval = config.get_float("snapshot_interval") if "snapshot_interval" in config else 30
 
         return cls(scenario_topic, speaker_topic, object_topic,
                    intention_topic, desire_topic,
-                   event_bus, resource_manager)
+                   event_bus, resource_manager, location_resolver=location_resolver_from_config(config),
+                   publish_interval=publish_interval, delta_updates=delta_updates,
+                   snapshot_interval=snapshot_interval, metrics=shared_metrics())
 
     def __init__(self, scenario_topic: str, speaker_topic: str, object_topic: str,
                  intention_topic: str, desire_topic: str,
-                 event_bus: EventBus, resource_manager: ResourceManager):
+                 event_bus: EventBus, resource_manager: ResourceManager, location_resolver: LocationResolver = None,
+                 publish_interval: float = 0, delta_updates: bool = False, snapshot_interval: float = 30,
+                 metrics: MetricsRegistry = None):
+        """
+        Parameters
+        ----------
+        location_resolver : LocationResolver
+            Provides the location of new scenarios.
+        publish_interval : float
+            Minimal interval in seconds between scenario updates, updates within the interval are
+            published together with the first event or scheduled invocation after the interval.
+        delta_updates : bool
+            Publish updates as :class:`ScenarioContextDelta` with only the changed context fields
+            instead of the full scenario.
+        snapshot_interval : float
+            Interval in seconds in which a full :class:`ScenarioSnapshot` is published for receivers
+            of delta updates, e.g. when they joined late.
+        metrics : MetricsRegistry
+            If set, event counts, processing times and queue depths are recorded.
+        """
         self._event_bus = event_bus
         self._resource_manager = resource_manager
 
@@ -45,22 +73,49 @@ class ContextService:
         self._object_topic = object_topic
 
         self._topic_worker = None
+        self._metrics = metrics
+        self._location_resolver = location_resolver if location_resolver else StaticLocationResolver()
 
         self.AGENT = AGENT
         self._scenario = None
+        # Number of occurrences of each label in the objects of the current scenario
+        self._object_counts = Counter()
+
+        # Updates are published from the topic worker thread only
+        self._publish_interval = publish_interval
+        self._last_publication = 0.0
+        self._pending_publication = False
+
+        self._delta_updates = delta_updates
+        self._snapshot_interval = snapshot_interval
+        self._version = 0
+        self._last_snapshot = 0.0
+        self._changed_speaker = None
+        self._added_objects = []
 
     @property
     def app(self):
         return None
 
     def start(self, timeout=30):
+        self._location_resolver.start()
+
         self._topic_worker = TopicWorker([self._intention_topic, self._desire_topic, self._speaker_topic, self._object_topic],
                                          self._event_bus, provides=[self._intention_topic],
-                                         buffer_size=32, processor=self._process,
+                                         buffer_size=32,
+                                         processor=instrumented(self._metrics, self.__class__.__name__, self._process),
                                          resource_manager=self._resource_manager,
+                                         scheduled=self._schedule_interval(),
                                          name=self.__class__.__name__)
         self._topic_worker.start().wait()
 
+    def _schedule_interval(self) -> Optional[float]:
+        intervals = [interval for interval, enabled in ((self._publish_interval, self._publish_interval > 0),
+                                                        (self._snapshot_interval, self._delta_updates))
+                     if enabled]
+
+        return min(intervals) if intervals else None
+
     def stop(self):
         if not self._topic_worker:
             pass
@@ -69,8 +124,14 @@ class ContextService:
         self._topic_worker.await_stop()
         self._topic_worker = None
 
-    def _process(self, event: Event):
-        if event.metadata.topic == self._intention_topic:
+        self._cancel_scenario_update()
+        self._location_resolver.stop()
+
+    def _process(self, event: Optional[Event]):
+        if event is None:
+            # Scheduled invocation to publish pending updates and snapshots
+            pass
+        elif event.metadata.topic == self._intention_topic:
             intentions = event.payload.intentions
             if "init" in intentions:
                 self._start_scenario()
@@ -87,11 +148,20 @@ class ContextService:
         else:
             logger.warning("Unhandled event: %s", event)
 
+        self._flush_scenario_update()
+        if self._delta_updates:
+            self._publish_snapshot_if_due()
+
     def _start_scenario(self):
         scenario, capsule = self._create_scenario()
+        self._cancel_scenario_update()
         self._event_bus.publish(self._scenario_topic,
                                 Event.for_payload(ScenarioStarted.create(scenario)))
         self._scenario = scenario
+        self._object_counts = Counter()
+        self._version = 0
+        self._last_snapshot = time.monotonic()
+        self._changed_speaker, self._added_objects = None, []
         logger.info("Started scenario %s", scenario)
 
     # TODO needed?
@@ -104,10 +174,13 @@ class ContextService:
         speaker_name = name_annotation.value.text
         self._scenario.context.speaker = Agent(speaker_name, None)
 
-        self._event_bus.publish(self._scenario_topic, Event.for_payload(ScenarioEvent.create(self._scenario)))
+        self._record_change(speaker=self._scenario.context.speaker)
+        self._publish_scenario_update()
         logger.info("Updated scenario %s", self._scenario)
 
     def _stop_scenario(self):
+        # The stopped event contains all pending updates
+        self._cancel_scenario_update()
         self._scenario.ruler.end = timestamp_now()
         self._event_bus.publish(self._scenario_topic,
                                 Event.for_payload(ScenarioStopped.create(self._scenario)))
@@ -145,20 +218,79 @@ class ContextService:
                         for annotation in mention.annotations
                         if annotation.type == class_type(Object) and annotation.value]
 
-        object_counts = Counter(object_labels)
-        current_counts = Counter(self._scenario.context.objects)
-        object_counts.subtract(current_counts)
-
-        for label, count in object_counts.items():
-            if count > 0:
-                self._scenario.context.objects.extend([label,] * count)
+        updated = False
+        for label, count in Counter(object_labels).items():
+            missing = count - self._object_counts[label]
+            if missing > 0:
+                self._scenario.context.objects.extend([label,] * missing)
+                self._object_counts[label] = count
+                self._record_change(objects=[label,] * missing)
+                updated = True
 
-        if any(cnt > 0 for cnt in object_counts.values()):
-            self._event_bus.publish(self._scenario_topic, Event.for_payload(ScenarioEvent.create(self._scenario)))
+        if updated:
+            self._publish_scenario_update()
             logger.info("Updated scenario with persons %s", self._scenario)
 
+    def _publish_scenario_update(self):
+        """
+        Publish the current scenario, at most once per publish interval.
+
+        Updates within the interval are coalesced and published by :meth:`_flush_scenario_update`
+        after the interval has passed, on the topic worker thread.
+        """
+        if self._pending_publication:
+            return
+
+        if time.monotonic() < self._last_publication + self._publish_interval:
+            self._pending_publication = True
+            return
+
+        self._event_bus.publish(self._scenario_topic, Event.for_payload(self._scenario_update()))
+
+    def _flush_scenario_update(self):
+        if not self._pending_publication or time.monotonic() < self._last_publication + self._publish_interval:
+            return
+
+        self._pending_publication = False
+        self._event_bus.publish(self._scenario_topic, Event.for_payload(self._scenario_update()))
+
+    def _publish_snapshot_if_due(self):
+        if not self._scenario or self._scenario.ruler.end \
+                or time.monotonic() < self._last_snapshot + self._snapshot_interval:
+            return
+
+        # The snapshot contains all pending changes
+        self._pending_publication = False
+        self._event_bus.publish(self._scenario_topic, Event.for_payload(self._scenario_update()))
+
+    def _record_change(self, speaker: Agent = None, objects: List[str] = ()):
+        if speaker:
+            self._changed_speaker = speaker
+        self._added_objects.extend(objects)
+
+    def _scenario_update(self):
+        """
+        Create the payload for the next scenario update.
+        """
+        now = time.monotonic()
+        self._last_publication = now
+
+        if not self._delta_updates:
+            return ScenarioEvent.create(self._scenario)
+
+        self._version += 1
+        if now >= self._last_snapshot + self._snapshot_interval:
+            self._last_snapshot = now
+            update = ScenarioSnapshot.create(self._scenario, self._version)
+        else:
+            update = ScenarioContextDelta.create(self._scenario.id, self._version,
+                                                 self._changed_speaker, self._added_objects or None)
+        self._changed_speaker, self._added_objects = None, []
+
+        return update
+
+    def _cancel_scenario_update(self):
+        self._pending_publication = False
+
     def _get_location(self):
-        try:
-            return requests.get("https://ipinfo.io").json()
-        except:
-            return {"country": "", "region": "", "city": ""}
+        return self._location_resolver.get_location()
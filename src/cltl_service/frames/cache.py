@@ -0,0 +1,148 @@
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Callable, Dict
+
+from cltl.backend.api.camera import Image
+from cltl.combot.infra.config import ConfigurationManager
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_CACHE_SIZE = 256 * 1024 * 1024
+
+
+@dataclass(frozen=True)
+class CacheStatistics:
+    hits: int
+    misses: int
+    evictions: int
+    entries: int
+    size: int
+
+
+def image_size(image: Image) -> int:
+    return image.image.nbytes + (image.depth.nbytes if image.depth is not None else 0)
+
+
+class FrameCache:
+    """
+    Thread-safe LRU cache of decoded images by image URL, bounded by the size of the image data.
+
+    Concurrent requests for an image that is currently being loaded wait for that load instead
+    of loading the image again. Cached images are shared between all users of the cache and are
+    therefore marked as read-only.
+    """
+
+    def __init__(self, max_size: int = DEFAULT_CACHE_SIZE):
+        """
+        Parameters
+        ----------
+        max_size : int
+            Maximum size of the cached image data in bytes.
+        """
+        self._max_size = max_size
+
+        self._entries: "OrderedDict[str, Image]" = OrderedDict()
+        self._loading: Dict[str, Future] = dict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    @property
+    def statistics(self) -> CacheStatistics:
+        with self._lock:
+            return CacheStatistics(self._hits, self._misses, self._evictions, len(self._entries), self._size)
+
+    def get(self, url: str, loader: Callable[[str], Image]) -> Image:
+        """
+        Get the image for the URL from the cache, or load it with the loader.
+        """
+        with self._lock:
+            if url in self._entries:
+                self._entries.move_to_end(url)
+                self._hits += 1
+                return self._entries[url]
+
+            future = self._loading.get(url)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._loading[url] = future
+                self._misses += 1
+            else:
+                self._hits += 1
+
+        if not owner:
+            return future.result()
+
+        try:
+            image = loader(url)
+            image.image.setflags(write=False)
+            if image.depth is not None:
+                image.depth.setflags(write=False)
+        except BaseException as e:
+            with self._lock:
+                del self._loading[url]
+            future.set_exception(e)
+            raise
+
+        # Cache the image before it is no longer loading, such that no concurrent request loads it again
+        with self._lock:
+            del self._loading[url]
+            self._put(url, image)
+        future.set_result(image)
+
+        return image
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def _put(self, url: str, image: Image):
+        previous = self._entries.pop(url, None)
+        if previous is not None:
+            self._size -= image_size(previous)
+
+        size = image_size(image)
+        if size > self._max_size:
+            logger.debug("Image %s of %s bytes exceeds the cache size", url, size)
+            return
+
+        self._entries[url] = image
+        self._size += size
+        while self._size > self._max_size:
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= image_size(evicted)
+            self._evictions += 1
+
+
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+
+
+def shared_frame_cache(config_manager: ConfigurationManager = None) -> FrameCache:
+    """
+    Get the process-wide frame cache.
+
+    The cache is created on the first call, with the size in MB configured as `cache_size`
+    in the `cltl.frames` configuration if available.
+    """
+    global _shared_cache
+
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            max_size = DEFAULT_CACHE_SIZE
+            if config_manager and "cltl.frames" in config_manager:
+                config = config_manager.get_config("cltl.frames")
+                if "cache_size" in config:
+                    max_size = int(config.get_float("cache_size") * 1024 * 1024)
+            _shared_cache = FrameCache(max_size)
+
+        return _shared_cache
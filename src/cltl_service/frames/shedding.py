@@ -0,0 +1,83 @@
+import logging
+import threading
+from typing import Callable, Generic, List, TypeVar
+
+logger = logging.getLogger(__name__)
+
+
+T = TypeVar("T")
+
+
+class LatestWorker(Generic[T]):
+    """
+    Process submitted items on a background thread, dropping items that are superseded
+    before they are processed.
+
+    Items submitted with `supersede=True` replace all pending items, other items are
+    queued after the pending items. This allows e.g. to drop a pending frame together
+    with its annotations when a new frame arrives.
+    """
+
+    def __init__(self, processor: Callable[[T], None], name: str = None):
+        self._processor = processor
+        self._name = name if name else self.__class__.__name__
+
+        self._pending: List[T] = []
+        self._condition = threading.Condition()
+        self._running = False
+        self._thread = None
+
+        self._submitted = 0
+        self._dropped = 0
+
+    @property
+    def submitted(self) -> int:
+        return self._submitted
+
+    @property
+    def dropped(self) -> int:
+        return self._dropped
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name=self._name, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def submit(self, item: T, supersede: bool = True):
+        with self._condition:
+            self._submitted += 1
+            if supersede and self._pending:
+                self._dropped += len(self._pending)
+                logger.debug("Dropped %s superseded items in %s", len(self._pending), self._name)
+                self._pending = []
+
+            self._pending.append(item)
+            self._condition.notify()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._running and not self._pending:
+                    self._condition.wait()
+                if not self._running:
+                    break
+
+                item = self._pending.pop(0)
+
+            try:
+                self._processor(item)
+            except:
+                logger.exception("Failed to process item in %s", self._name)
@@ -1,7 +1,7 @@
 import logging
 import random
-import re
-from typing import Mapping
+import threading
+from typing import Callable, Mapping, Set
 
 from cltl.commons.language_data.sentences import GREETING, GOODBYE
 from cltl.combot.event.bdi import DesireEvent
@@ -11,16 +11,20 @@ from cltl.combot.infra.event import Event, EventBus
 from cltl.combot.infra.resource import ResourceManager
 from cltl.combot.infra.time_util import timestamp_now
 from cltl.combot.infra.topic_worker import TopicWorker
+from cltl.leolani.phrases import PhraseSets
 from cltl_service.emissordata.client import EmissorDataClient
+from cltl_service.metrics.registry import MetricsRegistry, instrumented, shared_metrics
+from cltl_service.scheduling.deadline import DeadlineScheduler, shared_scheduler
 from emissor.representation.scenario import TextSignal
 
 logger = logging.getLogger(__name__)
 
 
 TIMEOUT = 120_000
+GREETING_DELAY = 30_000
 
 
-_GREETINGS = [re.sub('[^a-z]+', '', greeting.lower()) for greeting in GREETING]
+DEFAULT_PHRASES = {"en": {"greeting": GREETING, "affirmation": ["yes"]}}
 
 
 class InitService:
@@ -37,10 +41,18 @@ class InitService:
 
         greeting = config.get("greeting")
 
-        return cls(topics, greeting, emissor_client, event_bus, resource_manager)
+        languages = config.get("languages", multi=True) if "languages" in config else None
+        if "phrases" in config:
+            phrases = PhraseSets.load(config.get("phrases"), languages)
+        else:
+            phrases = PhraseSets(DEFAULT_PHRASES, languages)
+
+        return cls(topics, greeting, emissor_client, event_bus, resource_manager,
+                   phrases=phrases, scheduler=shared_scheduler(), metrics=shared_metrics())
 
     def __init__(self, topics: Mapping[str, str], greeting: str,
-                 emissor_client: EmissorDataClient, event_bus: EventBus, resource_manager: ResourceManager):
+                 emissor_client: EmissorDataClient, event_bus: EventBus, resource_manager: ResourceManager,
+                 phrases: PhraseSets = None, scheduler: DeadlineScheduler = None, metrics: MetricsRegistry = None):
         self._event_bus = event_bus
         self._resource_manager = resource_manager
         self._emissor_client = emissor_client
@@ -50,31 +62,62 @@ class InitService:
         self._text_in_topic = topics["text_in_topic"]
         self._text_out_topic = topics["text_out_topic"]
         self._greeting = greeting
+        # Phrase sets with greeting and affirmation phrases
+        self._phrases = phrases if phrases else PhraseSets(DEFAULT_PHRASES)
 
         self._topic_worker = None
-
+        self._intention_worker = None
+        self._metrics = metrics
+
+        # A scheduler created by the service is stopped together with it
+        self._own_scheduler = scheduler is None
+        self._scheduler = scheduler if scheduler is not None else DeadlineScheduler(self.__class__.__name__ + "-deadlines")
+        # Guards the initialization state against concurrent deadline callbacks
+        self._lock = threading.RLock()
+        self._active = False
         self._timeout = None
+        self._deadline = None
 
     @property
     def app(self):
         return None
 
     def start(self, timeout=30):
-        self._topic_worker = TopicWorker(list(filter(bool, [self._text_in_topic])),
-                                         self._event_bus, provides=[self._text_out_topic],
+        # Intentions are processed by a separate worker, such that text events cannot overwrite them
+        # in the buffer, the latest intention event determines whether initialization is active
+        if self._intention_topic:
+            self._intention_worker = TopicWorker(self._intention_topic, self._event_bus,
+                                                 resource_manager=self._resource_manager,
+                                                 processor=instrumented(self._metrics, self.__class__.__name__,
+                                                                        self._update_intentions),
+                                                 name=self.__class__.__name__ + "-intentions")
+        self._topic_worker = TopicWorker(self._text_in_topic, self._event_bus, provides=[self._text_out_topic],
                                          intentions=["init"], intention_topic=self._intention_topic,
-                                         resource_manager=self._resource_manager, processor=self._process,
-                                         scheduled=30,
+                                         resource_manager=self._resource_manager,
+                                         processor=instrumented(self._metrics, self.__class__.__name__, self._process),
                                          name=self.__class__.__name__)
+        if self._intention_worker:
+            self._intention_worker.start().wait()
         self._topic_worker.start().wait()
 
     def stop(self):
         if not self._topic_worker:
-            pass
+            return
 
-        self._topic_worker.stop()
-        self._topic_worker.await_stop()
+        workers = list(filter(None, [self._topic_worker, self._intention_worker]))
+        for worker in workers:
+            worker.stop()
+        for worker in workers:
+            worker.await_stop()
         self._topic_worker = None
+        self._intention_worker = None
+
+        with self._lock:
+            self._active = False
+            self._cancel_deadline()
+
+        if self._own_scheduler:
+            self._scheduler.stop()
 
     def _process(self, event: Event):
         if self._greeting:
@@ -82,36 +125,78 @@ class InitService:
         else:
             self._event_bus.publish(self._desire_topic, Event.for_payload(DesireEvent(["initialized"])))
 
-    def _process_event(self, event: Event):
-        timestamp = timestamp_now()
-
-        scheduled_invocation = event is None
-        if (scheduled_invocation or self._keyword(event)) and not self._timeout:
-            greeting = random.choice(GREETING) + " " + self._greeting
-            self._event_bus.publish(self._text_out_topic, Event.for_payload(self._create_text_signal_event(greeting)))
-            self._timeout = timestamp
-            logger.info("Start initialization")
-        elif scheduled_invocation:
-            pass
-        elif self._timeout and timestamp - self._timeout < TIMEOUT and self._start_utterance(event):
-            self._timeout = None
-            self._event_bus.publish(self._desire_topic, Event.for_payload(DesireEvent(["initialized"])))
-            logger.info("Interaction initialized")
-        elif self._timeout and timestamp - self._timeout > TIMEOUT:
-            self._timeout = None
-            goodbye = random.choice(GOODBYE) + " Let me know when you are back."
-            self._event_bus.publish(self._text_out_topic, Event.for_payload(self._create_text_signal_event(goodbye)))
-            logger.info("Reset initialization")
+    def _update_intentions(self, event: Event):
+        active = "init" in {getattr(intention, "label", intention) for intention in event.payload.intentions}
 
-        logger.debug("Unhandled event %s (%s - %s)", event, timestamp, self._timeout)
+        with self._lock:
+            if active == self._active:
+                return
+
+            self._active = active
+            self._timeout = None
+            self._cancel_deadline()
 
-    def _start_utterance(self, event):
-        return event.metadata.topic == self._text_in_topic and "yes" in event.payload.signal.text.lower()
+            if active and self._greeting:
+                self._schedule(GREETING_DELAY, self._greet)
+            elif active:
+                self._event_bus.publish(self._desire_topic, Event.for_payload(DesireEvent(["initialized"])))
 
-    def _keyword(self, event):
+    def _process_event(self, event: Event):
+        matched = self._match_phrases(event)
+
+        with self._lock:
+            if "greeting" in matched and not self._timeout:
+                self._greet()
+            elif self._timeout and "affirmation" in matched:
+                self._timeout = None
+                self._cancel_deadline()
+                self._event_bus.publish(self._desire_topic, Event.for_payload(DesireEvent(["initialized"])))
+                logger.info("Interaction initialized")
+            else:
+                logger.debug("Unhandled event %s (%s)", event, self._timeout)
+
+    def _greet(self):
+        greeting = random.choice(GREETING) + " " + self._greeting
+        self._event_bus.publish(self._text_out_topic, Event.for_payload(self._create_text_signal_event(greeting)))
+        self._timeout = timestamp_now()
+        self._schedule(TIMEOUT, self._reset)
+        logger.info("Start initialization")
+
+    def _reset(self):
+        self._timeout = None
+        goodbye = random.choice(GOODBYE) + " Let me know when you are back."
+        self._event_bus.publish(self._text_out_topic, Event.for_payload(self._create_text_signal_event(goodbye)))
+        self._schedule(GREETING_DELAY, self._greet)
+        logger.info("Reset initialization")
+
+    def _schedule(self, delay: int, callback: Callable[[], None]):
+        """
+        Replace the pending deadline with the callback after `delay` milliseconds, must be called with the lock held.
+        """
+        self._cancel_deadline()
+
+        deadline = None
+
+        def invoke():
+            with self._lock:
+                # Ignore deadlines that were replaced after they became due
+                if self._active and self._deadline is deadline:
+                    self._deadline = None
+                    callback()
+
+        deadline = self._scheduler.schedule(delay / 1000, invoke)
+        self._deadline = deadline
+
+    def _cancel_deadline(self):
+        if self._deadline:
+            self._deadline.cancel()
+            self._deadline = None
+
+    def _match_phrases(self, event) -> Set[str]:
         if event.metadata.topic == self._text_in_topic:
-            utterance = re.sub('[^a-z]+', '', event.payload.signal.text.lower())
-            return any(greeting in utterance for greeting in _GREETINGS)
+            return self._phrases.match(event.payload.signal.text)
+
+        return set()
 
     def _create_text_signal_event(self, text: str):
         scenario_id = self._emissor_client.get_current_scenario_id()
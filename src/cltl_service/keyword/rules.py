@@ -0,0 +1,71 @@
+import json
+import logging
+from dataclasses import dataclass, field
+from typing import Iterable, List, Optional
+
+from cltl.commons.language_data.sentences import GOODBYE
+from cltl.leolani.phrases import Phrase, PhraseMatcher
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class KeywordRule:
+    """
+    Rule that achieves a desire when one of its phrases is said.
+
+    If `exact` is set, a phrase must be the complete utterance, otherwise it can occur
+    anywhere in the utterance. If `replies` are given, one of them is said when the
+    rule matches.
+    """
+    desire: str
+    phrases: List[str]
+    replies: List[str] = field(default_factory=list)
+    exact: bool = False
+
+
+DEFAULT_RULES = [KeywordRule("quit", list(GOODBYE), list(GOODBYE), exact=True)]
+
+
+class KeywordRules:
+    """
+    Keyword rules compiled into a single :class:`PhraseMatcher`.
+    """
+
+    def __init__(self, rules: Iterable[KeywordRule] = None):
+        self._rules = list(rules) if rules is not None else list(DEFAULT_RULES)
+        self._matcher = PhraseMatcher(Phrase(phrase, rule, rule.exact)
+                                      for rule in self._rules for phrase in rule.phrases)
+
+        logger.debug("Compiled %s keyword rules with %s phrases", len(self._rules), len(self._matcher))
+
+    @property
+    def rules(self) -> List[KeywordRule]:
+        return list(self._rules)
+
+    def match(self, utterance: str) -> Optional[KeywordRule]:
+        """
+        The rule with a phrase that matches the utterance, exact matches take precedence,
+        otherwise the rule with the phrase that ends first in the utterance.
+        """
+        return self._matcher.first(utterance)
+
+    @classmethod
+    def load(cls, path: str) -> "KeywordRules":
+        """
+        Load rules from a JSON file with a list of objects with the fields of :class:`KeywordRule`.
+        """
+        with open(path) as rules_file:
+            rules = json.load(rules_file)
+
+        try:
+            return cls(KeywordRule(**rule) for rule in rules)
+        except TypeError as e:
+            raise ValueError(f"Invalid keyword rules in {path}: {e}")
+
+
+def rules_from_config(config) -> KeywordRules:
+    """
+    Keyword rules from the JSON file configured as `rules`, or the default rules.
+    """
+    return KeywordRules.load(config.get("rules")) if "rules" in config else KeywordRules()
@@ -1,6 +1,6 @@
 import logging
 import random
-from typing import Mapping
+from typing import Mapping, Optional
 
 from cltl.combot.event.bdi import DesireEvent
 from cltl.combot.event.emissor import TextSignalEvent
@@ -9,8 +9,9 @@ from cltl.combot.infra.event import Event, EventBus
 from cltl.combot.infra.resource import ResourceManager
 from cltl.combot.infra.time_util import timestamp_now
 from cltl.combot.infra.topic_worker import TopicWorker
-from cltl.commons.language_data.sentences import GOODBYE
 from cltl_service.emissordata.client import EmissorDataClient
+from cltl_service.keyword.rules import KeywordRule, KeywordRules, rules_from_config
+from cltl_service.metrics.registry import MetricsRegistry, instrumented, shared_metrics
 from emissor.representation.scenario import TextSignal
 
 logger = logging.getLogger(__name__)
@@ -28,10 +29,12 @@ class KeywordService:
             "text_out_topic": config.get("topic_text_out")
         }
 
-        return cls(topics, emissor_client, event_bus, resource_manager)
+        return cls(topics, emissor_client, event_bus, resource_manager,
+                   rules=rules_from_config(config), metrics=shared_metrics())
 
     def __init__(self, topics: Mapping[str, str],
-                 emissor_client: EmissorDataClient, event_bus: EventBus, resource_manager: ResourceManager):
+                 emissor_client: EmissorDataClient, event_bus: EventBus, resource_manager: ResourceManager,
+                 rules: KeywordRules = None, metrics: MetricsRegistry = None):
         self._event_bus = event_bus
         self._resource_manager = resource_manager
         self._emissor_client = emissor_client
@@ -42,6 +45,9 @@ class KeywordService:
         self._text_out_topic = topics["text_out_topic"]
 
         self._topic_worker = None
+        self._metrics = metrics
+
+        self._rules = rules if rules else KeywordRules()
 
     @property
     def app(self):
@@ -51,7 +57,8 @@ class KeywordService:
         self._topic_worker = TopicWorker([self._text_in_topic],
                                          self._event_bus, provides=[self._text_out_topic],
                                          intentions=["chat"], intention_topic=self._intention_topic,
-                                         resource_manager=self._resource_manager, processor=self._process,
+                                         resource_manager=self._resource_manager,
+                                         processor=instrumented(self._metrics, self.__class__.__name__, self._process),
                                          name=self.__class__.__name__)
         self._topic_worker.start().wait()
 
@@ -64,19 +71,21 @@ class KeywordService:
         self._topic_worker = None
 
     def _process(self, event: Event):
-        if self._keyword(event):
-            self._event_bus.publish(self._desire_topic, Event.for_payload(DesireEvent(['quit'])))
-            self._event_bus.publish(self._text_out_topic, Event.for_payload(self._greeting_payload()))
+        rule = self._keyword(event)
+        if rule:
+            self._event_bus.publish(self._desire_topic, Event.for_payload(DesireEvent([rule.desire])))
+            if rule.replies:
+                self._event_bus.publish(self._text_out_topic, Event.for_payload(self._reply_payload(rule)))
 
-    def _keyword(self, event):
+    def _keyword(self, event) -> Optional[KeywordRule]:
         if event.metadata.topic == self._text_in_topic:
-            return any(event.payload.signal.text.lower() == bye.lower() for bye in GOODBYE)
+            return self._rules.match(event.payload.signal.text)
 
-        return False
+        return None
 
-    def _greeting_payload(self):
+    def _reply_payload(self, rule: KeywordRule):
         scenario_id = self._emissor_client.get_current_scenario_id()
         signal = TextSignal.for_scenario(scenario_id, timestamp_now(), timestamp_now(), None,
-                                         random.choice(GOODBYE))
+                                         random.choice(rule.replies))
 
         return TextSignalEvent.for_agent(signal)
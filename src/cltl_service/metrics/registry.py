@@ -0,0 +1,226 @@
+import bisect
+import logging
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from cltl.combot.infra.event import Event
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: dict) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+
+    escaped = (value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n") for _, value in labels)
+
+    return "{" + ",".join(f"{key}=\"{value}\"" for (key, _), value in zip(labels, escaped)) + "}"
+
+
+class Metric:
+    """
+    Base class of metrics with labels.
+
+    Besides values recorded by the metric itself, values can be provided by a function
+    that is evaluated when the metric is collected, e.g. to report the size of a queue
+    or a counter that is maintained elsewhere.
+    """
+    type = "untyped"
+
+    def __init__(self, name: str, description: str):
+        self.name = name
+        self.description = description
+
+        self._lock = threading.Lock()
+        self._values: Dict[Labels, float] = dict()
+        self._functions: Dict[Labels, Callable[[], float]] = dict()
+
+    def set_function(self, function: Callable[[], float], **labels):
+        with self._lock:
+            self._functions[_labels(labels)] = function
+
+    def samples(self) -> Iterable[Tuple[str, Labels, float]]:
+        with self._lock:
+            values = dict(self._values)
+            functions = dict(self._functions)
+
+        for labels, function in functions.items():
+            try:
+                values[labels] = function()
+            except:
+                logger.debug("Failed to collect %s for %s", self.name, labels, exc_info=True)
+
+        return ((self.name, labels, value) for labels, value in values.items())
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = _labels(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[_labels(labels)] = value
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, description: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, description)
+        self._buckets = tuple(sorted(buckets))
+        self._histograms: Dict[Labels, Tuple[List[int], List[float]]] = dict()
+
+    def observe(self, value: float, **labels):
+        key = _labels(labels)
+        with self._lock:
+            if key not in self._histograms:
+                # Bucket counts including +Inf, and the sum of the observed values
+                self._histograms[key] = ([0] * (len(self._buckets) + 1), [0.0])
+            counts, total = self._histograms[key]
+            counts[bisect.bisect_left(self._buckets, value)] += 1
+            total[0] += value
+
+    def samples(self) -> Iterable[Tuple[str, Labels, float]]:
+        with self._lock:
+            histograms = {labels: (list(counts), total[0]) for labels, (counts, total) in self._histograms.items()}
+
+        for labels, (counts, total) in histograms.items():
+            cumulative = 0
+            for bound, count in zip(self._buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                yield self.name + "_bucket", labels + (("le", le),), cumulative
+            yield self.name + "_sum", labels, total
+            yield self.name + "_count", labels, cumulative
+
+
+class MetricsRegistry:
+    """
+    Thread-safe registry of metrics that renders them in the Prometheus text format.
+
+    Services record their metrics with the :meth:`instrument`, :meth:`track_queue` and
+    :meth:`track_drops` methods, such that all services report the same metrics labeled
+    by the name of the service.
+    """
+
+    def __init__(self, prefix: str = "cltl_"):
+        self._prefix = prefix
+        self._metrics: Dict[str, Metric] = dict()
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, description: str) -> Counter:
+        return self._get(Counter, name, description)
+
+    def gauge(self, name: str, description: str) -> Gauge:
+        return self._get(Gauge, name, description)
+
+    def histogram(self, name: str, description: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get(Histogram, name, description, buckets)
+
+    def _get(self, cls, name: str, description: str, *args) -> Metric:
+        name = self._prefix + name
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = cls(name, description, *args)
+            elif not isinstance(self._metrics[name], cls):
+                raise ValueError(f"Metric {name} is already registered as {self._metrics[name].type}")
+
+            return self._metrics[name]
+
+    def instrument(self, service: str, processor: Callable[[Optional[Event]], None]) -> Callable[[Optional[Event]], None]:
+        """
+        Wrap an event processor to record the number of events, errors and the processing time per topic.
+
+        Scheduled invocations without event are recorded with topic `scheduled`.
+        """
+        events = self.counter("events_total", "Number of processed events.")
+        errors = self.counter("event_errors_total", "Number of events that failed to be processed.")
+        latency = self.histogram("event_processing_seconds", "Time to process an event in seconds.")
+
+        def instrumented(event: Optional[Event]):
+            topic = event.metadata.topic if event else "scheduled"
+            start = time.perf_counter()
+            try:
+                processor(event)
+            except:
+                errors.inc(service=service, topic=topic)
+                raise
+            finally:
+                latency.observe(time.perf_counter() - start, service=service, topic=topic)
+                events.inc(service=service, topic=topic)
+
+        return instrumented
+
+    def track_queue(self, service: str, queue: str, size: Callable[[], int]):
+        """
+        Report the number of items waiting in a queue of the service.
+        """
+        self.gauge("queue_depth", "Number of items waiting to be processed.") \
+            .set_function(size, service=service, queue=queue)
+
+    def track_drops(self, service: str, reason: str, count: Callable[[], int]):
+        """
+        Report the number of items dropped by the service.
+        """
+        self.counter("dropped_total", "Number of items dropped without being processed.") \
+            .set_function(count, service=service, reason=reason)
+
+    def exposition(self) -> str:
+        """
+        Render all metrics in the Prometheus text exposition format.
+        """
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda metric: metric.name)
+
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.description}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(f"{name}{_format_labels(labels)} {value}" for name, labels, value in metric.samples())
+
+        return "\n".join(lines) + "\n"
+
+
+def instrumented(metrics: Optional[MetricsRegistry], service: str,
+                 processor: Callable[[Optional[Event]], None]) -> Callable[[Optional[Event]], None]:
+    """
+    The processor instrumented with :meth:`MetricsRegistry.instrument`, or the processor itself if there are no metrics.
+
+    Use this to create the processor of a TopicWorker.
+    """
+    return metrics.instrument(service, processor) if metrics is not None else processor
+
+
+_shared_registry = None
+_shared_registry_lock = threading.Lock()
+
+
+def shared_metrics() -> MetricsRegistry:
+    """
+    Get the process-wide metrics registry.
+    """
+    global _shared_registry
+
+    with _shared_registry_lock:
+        if _shared_registry is None:
+            _shared_registry = MetricsRegistry()
+
+        return _shared_registry
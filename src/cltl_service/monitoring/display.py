@@ -0,0 +1,95 @@
+import dataclasses
+import io
+import threading
+from dataclasses import dataclass, field
+from typing import Iterable, Optional, Tuple
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+try:
+    import matplotlib.font_manager
+    system_fonts = matplotlib.font_manager.findSystemFonts(fontpaths=None, fontext='ttf')
+    arial = next(f for f in system_fonts if 'arial' in f.lower() and 'bold' in f.lower())
+    FONT = ImageFont.truetype(arial, 25)
+except:
+    FONT = ImageFont.load_default()
+
+
+def to_display_size(array: np.ndarray, display_size: Tuple[int, int]) -> Tuple[Image.Image, Tuple[float, float]]:
+    """
+    Scale the image array down to fit the display size without a full resolution copy.
+
+    The array is first subsampled by an integer stride, such that only the pixels
+    needed for the display are copied, and then resized to the display size.
+
+    Returns
+    -------
+    Tuple[Image.Image, Tuple[float, float]]
+        The image at display size and the scale from image to display coordinates.
+    """
+    height, width = array.shape[:2]
+    factor = min(display_size[0] / width, display_size[1] / height)
+    if factor >= 1:
+        return Image.fromarray(array), (1.0, 1.0)
+
+    stride = int(1 / factor)
+    scaled_size = (max(1, int(factor * width)), max(1, int(factor * height)))
+
+    image = Image.fromarray(np.ascontiguousarray(array[::stride, ::stride]) if stride > 1 else array)
+    if image.size != scaled_size:
+        image = image.resize(scaled_size, Image.BILINEAR)
+
+    return image, (scaled_size[0] / width, scaled_size[1] / height)
+
+
+@dataclass(frozen=True)
+class DisplayFrame:
+    """
+    Immutable snapshot of the image shown in the monitoring view.
+
+    A frame is never modified after it is created, changes to the image or its annotations
+    create a new frame instead. The annotated JPEG is rendered on first access and shared
+    by all readers of the frame.
+    """
+    version: int
+    image: Image.Image
+    scale: Tuple[float, float] = (1.0, 1.0)
+    items: Tuple[Tuple[str, tuple], ...] = ()
+    _jpeg: Optional[bytes] = field(default=None, init=False, repr=False, compare=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False, compare=False)
+
+    def annotate(self, items: Iterable[Tuple[str, tuple]]) -> "DisplayFrame":
+        """
+        Create the next frame with the same image and additional annotations.
+
+        Parameters
+        ----------
+        items : Iterable[Tuple[str, tuple]]
+            Labels and their bounds in image coordinates.
+        """
+        return dataclasses.replace(self, version=self.version + 1, items=self.items + tuple(items))
+
+    def jpeg(self) -> bytes:
+        if self._jpeg is None:
+            with self._lock:
+                if self._jpeg is None:
+                    object.__setattr__(self, "_jpeg", self._render())
+
+        return self._jpeg
+
+    def _render(self) -> bytes:
+        image = self.image
+        if self.items:
+            image = image.copy()
+            scale_x, scale_y = self.scale
+            draw = ImageDraw.Draw(image)
+            for name, bbox in self.items:
+                bbox = (bbox[0] * scale_x, bbox[1] * scale_y, bbox[2] * scale_x, bbox[3] * scale_y)
+                draw.rectangle(bbox, outline=(0, 0, 0))
+                draw.text((bbox[0], bbox[1]), (name[:12] + ".." if len(name) > 12 else name), fill=(255, 0, 0), font=FONT)
+
+        img_src = io.BytesIO()
+        image.save(img_src, format="JPEG")
+
+        return img_src.getvalue()
@@ -1,13 +1,13 @@
-import io
 import json
 import logging
+import threading
 import time
+import uuid
 from functools import wraps
 from http import HTTPStatus
-from typing import Callable
+from typing import Callable, Optional, Tuple
 
 import flask
-from PIL import Image, ImageDraw, ImageFont
 from cltl.backend.source.client_source import ClientImageSource
 from cltl.backend.spi.image import ImageSource
 from cltl.combot.infra.config import ConfigurationManager
@@ -15,6 +15,10 @@ from cltl.combot.infra.event import Event, EventBus
 from cltl.combot.infra.resource import ResourceManager
 from cltl.combot.infra.topic_worker import TopicWorker
 from cltl.combot.infra.util import ThreadsafeValue
+from cltl_service.frames.cache import FrameCache, shared_frame_cache
+from cltl_service.frames.shedding import LatestWorker
+from cltl_service.metrics.registry import MetricsRegistry, instrumented, shared_metrics
+from cltl_service.monitoring.display import DisplayFrame, to_display_size
 from cltl.object_recognition.api import Object
 from emissor.representation.scenario import class_type
 from flask import Response
@@ -22,15 +26,6 @@ from flask import Response
 logger = logging.getLogger(__name__)
 
 
-try:
-    import matplotlib.font_manager
-    system_fonts = matplotlib.font_manager.findSystemFonts(fontpaths=None, fontext='ttf')
-    arial = next(f for f in system_fonts if 'arial' in f.lower() and 'bold' in f.lower())
-    FONT = ImageFont.truetype(arial, 25)
-except:
-    FONT = ImageFont.load_default()
-
-
 def no_cache(f):
     """ Flask decorator that sets headers to prevent caching. """
     @wraps(f)
@@ -46,6 +41,7 @@ def no_cache(f):
 
 class MonitoringService:
     ACTIVE_INTERVAL = 15 #sec
+    DISPLAY_SIZE = (1200, 750)
 
     @classmethod
     def from_config(cls, event_bus: EventBus, resource_manager: ResourceManager, config_manager: ConfigurationManager):
@@ -58,16 +54,21 @@ class MonitoringService:
         def image_loader(url) -> ImageSource:
             return ClientImageSource.from_config(config_manager, url)
 
+        latest_only = config.get_boolean("latest_only") if "latest_only" in config else False
+
         return cls(image_topic, object_topic, text_in_topic, text_out_topic,
-                   image_loader, event_bus, resource_manager)
+                   image_loader, event_bus, resource_manager, frame_cache=shared_frame_cache(config_manager),
+                   latest_only=latest_only, metrics=shared_metrics())
 
     def __init__(self, image_topic: str, object_topic: str, text_in_topic: str, text_out_topic: str,
                  image_loader: Callable[[str], ImageSource],
-                 event_bus: EventBus, resource_manager: ResourceManager):
+                 event_bus: EventBus, resource_manager: ResourceManager, frame_cache: FrameCache = None,
+                 latest_only: bool = False, metrics: MetricsRegistry = None):
         self._event_bus = event_bus
         self._resource_manager = resource_manager
 
         self._image_loader = image_loader
+        self._frame_cache = frame_cache
 
         self._image_topic = image_topic
         self._object_topic = object_topic
@@ -75,13 +76,21 @@ class MonitoringService:
         self._text_out_topic = text_out_topic
 
         self._topic_worker = None
+        # Images are rendered on a separate thread, dropping frames that are superseded before they are rendered
+        self._frame_worker = LatestWorker(self._process_frame_event, name=self.__class__.__name__ + "-frames") \
+            if latest_only else None
+
+        self._metrics = metrics
 
         self._friend_cache = dict()
 
         self._app = None
-        self._text_info = None
-        self._image = None
-        self._display = None
+        # Immutable snapshots, replaced as a whole by the event threads and read without locking
+        self._frame: Optional[DisplayFrame] = None
+        self._text = (0, None)
+        self._display_id = uuid.uuid4().hex[:8]
+        # Notifies streaming clients about new snapshots
+        self._updated = threading.Condition()
 
         self._active = ThreadsafeValue(None)
 
@@ -97,33 +106,131 @@ class MonitoringService:
         def text_info():
             self._active.value = time.time()
 
-            if not self._text_info:
+            _, text_info = self._text
+            if not text_info:
                 return Response(status=HTTPStatus.NOT_FOUND)
 
-            return Response(json.dumps(self._text_info), mimetype="application/json")
+            return Response(json.dumps(text_info), mimetype="application/json")
 
         @self._app.route('/image.jpg', methods=['GET'])
-        @no_cache
         def _image():
             self._active.value = time.time()
 
-            if not self._display:
+            encoded = self._encode_display()
+            if not encoded:
                 return Response(status=HTTPStatus.NOT_FOUND)
 
-            response = flask.send_file(io.BytesIO(self._display), mimetype='image/jpeg')
+            etag, jpeg = encoded
+            if flask.request.if_none_match.contains(etag):
+                response = Response(status=HTTPStatus.NOT_MODIFIED)
+            else:
+                response = Response(jpeg, mimetype='image/jpeg')
+            response.set_etag(etag)
+            # Clients must revalidate with the ETag before using a cached image
+            response.headers['Cache-Control'] = 'no-cache'
 
             return response
 
+        @self._app.route('/metrics', methods=['GET'])
+        @no_cache
+        def metrics():
+            if not self._metrics:
+                return Response(status=HTTPStatus.NOT_FOUND)
+
+            return Response(self._metrics.exposition(), mimetype="text/plain; version=0.0.4")
+
+        @self._app.route('/image.mjpg', methods=['GET'])
+        def _image_stream():
+            self._active.value = time.time()
+
+            return Response(self._stream_images(), mimetype='multipart/x-mixed-replace; boundary=frame',
+                            headers={'Cache-Control': 'no-cache'})
+
+        @self._app.route('/text/stream', methods=['GET'])
+        def _text_stream():
+            self._active.value = time.time()
+
+            return Response(self._stream_text(), mimetype='text/event-stream',
+                            headers={'Cache-Control': 'no-cache'})
+
         return self._app
 
+    def _stream_images(self):
+        """
+        Yield each new display version as part of a multipart MJPEG stream.
+        """
+        version = 0
+        while True:
+            # Keep monitoring active while clients are connected
+            self._active.value = time.time()
+
+            with self._updated:
+                self._updated.wait_for(lambda: self._frame_version() != version, timeout=self.ACTIVE_INTERVAL / 3)
+
+            frame = self._frame
+            if not frame or frame.version == version:
+                continue
+
+            version = frame.version
+            # The JPEG is shared by all clients and only encoded once per frame
+            jpeg = frame.jpeg()
+            yield (b'--frame\r\nContent-Type: image/jpeg\r\nContent-Length: ' + str(len(jpeg)).encode() + b'\r\n\r\n'
+                   + jpeg + b'\r\n')
+
+    def _stream_text(self):
+        """
+        Yield each new text as server-sent event.
+        """
+        version = None
+        while True:
+            self._active.value = time.time()
+
+            with self._updated:
+                self._updated.wait_for(lambda: self._text[0] != version, timeout=self.ACTIVE_INTERVAL / 3)
+
+            text_version, text_info = self._text
+
+            updated, version = text_version != version, text_version
+            if not updated or not text_info:
+                # Comment line as heartbeat, detects disconnected clients
+                yield ": keep-alive\n\n"
+                continue
+
+            yield f"id: {version}\ndata: {json.dumps(text_info)}\n\n"
+
+    def _frame_version(self) -> int:
+        frame = self._frame
+
+        return frame.version if frame else 0
+
+    @property
+    def dropped_frames(self) -> int:
+        """
+        Number of image and object events that were dropped in favour of a more recent frame.
+        """
+        return self._frame_worker.dropped if self._frame_worker else 0
+
     def start(self, timeout=30):
+        if self._frame_worker:
+            self._frame_worker.start()
+
         self._topic_worker = TopicWorker([self._image_topic, self._object_topic,
                                           self._text_in_topic, self._text_out_topic],
-                                         self._event_bus, buffer_size=8, processor=self._process,
+                                         self._event_bus, buffer_size=8,
+                                         processor=instrumented(self._metrics, self.__class__.__name__, self._process),
                                          resource_manager=self._resource_manager,
                                          name=self.__class__.__name__)
+        if self._metrics:
+            self._track_metrics()
         self._topic_worker.start().wait()
 
+    def _track_metrics(self):
+        name = self.__class__.__name__
+
+        if self._frame_worker:
+            self._metrics.track_queue(name, "frames", lambda: self._frame_worker.pending)
+            self._metrics.track_drops(name, "frame_superseded", lambda: self.dropped_frames)
+
     def stop(self):
         if not self._topic_worker:
             pass
@@ -132,6 +239,9 @@ class MonitoringService:
         self._topic_worker.await_stop()
         self._topic_worker = None
 
+        if self._frame_worker:
+            self._frame_worker.stop()
+
     def _process(self, event: Event):
         if not self._active.value:
             logger.debug("Skipping event while monitoring is not active")
@@ -146,30 +256,48 @@ class MonitoringService:
             self._update_text(event, "You")
         elif event.metadata.topic == self._text_out_topic:
             self._update_text(event, "Leolani")
-        elif event.metadata.topic == self._image_topic:
+        elif event.metadata.topic == self._image_topic and self._frame_worker:
+            self._frame_worker.submit(event, supersede=True)
+        elif event.metadata.topic == self._object_topic and self._frame_worker:
+            self._frame_worker.submit(event, supersede=False)
+        elif event.metadata.topic in (self._image_topic, self._object_topic):
+            self._process_frame_event(event)
+        else:
+            logger.warning("Unhandled event: %s", event)
+
+    def _process_frame_event(self, event: Event):
+        if event.metadata.topic == self._image_topic:
             self._update_image(event)
         elif event.metadata.topic == self._object_topic:
             self._update_objects(event)
-        else:
-            logger.warning("Unhandled event: %s", event)
 
     def _update_text(self, event, speaker):
-        self._text_info = {
+        text_info = {
             "utterance": event.payload.signal.text,
             "speaker": speaker
         }
 
+        with self._updated:
+            self._text = (self._text[0] + 1, text_info)
+            self._updated.notify_all()
+
     def _update_image(self, event):
         image_location = event.payload.signal.files[0]
 
-        with self._image_loader(image_location) as source:
-            image = source.capture()
+        if self._frame_cache:
+            image = self._frame_cache.get(image_location, self._capture_image)
+        else:
+            image = self._capture_image(image_location)
 
-        self._image = Image.fromarray(image.image)
-        self._create_display(self._image)
+        display_image, scale = to_display_size(image.image, self.DISPLAY_SIZE)
+        self._publish_frame(DisplayFrame(self._frame_version() + 1, display_image, scale))
 
         logger.debug("Updated image")
 
+    def _capture_image(self, image_location):
+        with self._image_loader(image_location) as source:
+            return source.capture()
+
     def _get_name(self, face_id):
         if face_id in self._friend_cache:
             return self._friend_cache[face_id]
@@ -192,26 +320,30 @@ class MonitoringService:
         self._annotate_image(objects)
 
     def _annotate_image(self, items) -> None:
-        if not self._image or not items:
+        frame = self._frame
+        if not frame or not items:
             return
 
-        draw = ImageDraw.Draw(self._image)
-        for name, bbox in items:
-            draw.rectangle(bbox, outline=(0, 0, 0))
-            draw.text((bbox[0], bbox[1]), (name[:12] + ".." if len(name) > 12 else name), fill=(255, 0, 0), font=FONT)
-
-        self._create_display(self._image)
+        self._publish_frame(frame.annotate(items))
 
         logger.debug("Draw %s items in image", len(items))
 
-    def _create_display(self, image) -> None:
-        factor = min(1200/image.size[0], 750/image.size[1])
-        new_size = tuple(int(factor * dim) for dim in image.size)
-
-        resized = image.resize(new_size, Image.ANTIALIAS)
-
-        img_src = io.BytesIO()
-        resized.save(img_src, format="JPEG")
-        img_src.seek(0)
-
-        self._display = img_src.read()
+    def _publish_frame(self, frame: DisplayFrame) -> None:
+        with self._updated:
+            self._frame = frame
+            self._updated.notify_all()
+
+    def _encode_display(self) -> Optional[Tuple[str, bytes]]:
+        """
+        Encode the current display image as JPEG, at most once per frame.
+
+        Returns
+        -------
+        Optional[Tuple[str, bytes]]
+            The ETag and the JPEG encoded image, None if there is no image to display.
+        """
+        frame = self._frame
+        if not frame:
+            return None
+
+        return f"{self._display_id}-{frame.version}", frame.jpeg()
@@ -0,0 +1,250 @@
+import json
+import logging
+import mmap
+import os
+import pickle
+import struct
+import threading
+import zlib
+from dataclasses import dataclass
+from typing import Iterator, List, Mapping, Tuple
+
+import numpy as np
+from cltl.backend.api.camera import Image
+from cltl.backend.spi.image import ImageSource
+from cltl.combot.infra.event import Event
+
+logger = logging.getLogger(__name__)
+
+
+MAGIC = b"CLTLEVT1"
+
+# Timestamp in seconds, length of the JSON header, length of the data following the header
+_RECORD = struct.Struct("<dIQ")
+
+
+@dataclass(frozen=True)
+class LogRecord:
+    """
+    Index entry of an event in an event log.
+
+    The event and its images are only read from the log when they are requested from the
+    :class:`EventLogReader`.
+    """
+    timestamp: float
+    topic: str
+    images: Tuple[str, ...]
+    offset: int
+    header: dict
+
+
+def _scan(buffer) -> Tuple[List[LogRecord], int]:
+    """
+    Index the complete records in the buffer.
+
+    Returns
+    -------
+    Tuple[List[LogRecord], int]
+        The records and the offset after the last complete record.
+    """
+    records = []
+    offset = len(MAGIC)
+    size = len(buffer)
+    while offset + _RECORD.size <= size:
+        timestamp, header_length, length = _RECORD.unpack_from(buffer, offset)
+        end = offset + _RECORD.size + header_length + length
+        if end > size:
+            break
+
+        try:
+            header = json.loads(bytes(buffer[offset + _RECORD.size:offset + _RECORD.size + header_length]))
+        except ValueError:
+            break
+        images = tuple(dict.fromkeys(array["url"] for array in header["arrays"]))
+        records.append(LogRecord(timestamp, header["topic"], images, offset + _RECORD.size + header_length, header))
+        offset = end
+
+    return records, offset
+
+
+class EventLogWriter:
+    """
+    Append events with the images they reference to an event log.
+
+    Each record consists of a fixed size prefix, a JSON header with the topic, the image views
+    and the layout of the image arrays, the pickled event and the raw image arrays, optionally
+    compressed. Records are only appended, a record that is incomplete because writing was
+    interrupted is skipped when the log is read and truncated when the log is reopened for writing.
+    """
+
+    def __init__(self, path: str, compress: bool = False):
+        """
+        Parameters
+        ----------
+        path : str
+            Path of the log file, if the file exists, events are appended to it.
+        compress : bool
+            Compress image arrays with zlib.
+        """
+        self._path = path
+        self._compress = compress
+        self._lock = threading.Lock()
+
+        exists = os.path.exists(path) and os.path.getsize(path) > 0
+        if exists:
+            self._truncate_incomplete(path)
+
+        self._file = open(path, "ab")
+        if not exists:
+            self._file.write(MAGIC)
+
+    @staticmethod
+    def _truncate_incomplete(path: str):
+        with open(path, "r+b") as log_file:
+            if log_file.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not an event log")
+
+            with mmap.mmap(log_file.fileno(), 0, access=mmap.ACCESS_READ) as log_map:
+                size = len(log_map)
+                _, end = _scan(log_map)
+
+            if end < size:
+                logger.warning("Truncated incomplete record at the end of event log %s", path)
+                log_file.truncate(end)
+
+    def append(self, timestamp: float, topic: str, event: Event, images: Mapping[str, Image] = None):
+        """
+        Append an event received at `timestamp` on `topic`, together with the images it references by URL.
+        """
+        images = images if images else dict()
+
+        arrays = []
+        layout = []
+        for url, image in images.items():
+            for field, array in (("image", image.image), ("depth", image.depth)):
+                if array is None:
+                    continue
+                data = np.ascontiguousarray(array).tobytes()
+                if self._compress:
+                    data = zlib.compress(data, 1)
+                arrays.append(data)
+                layout.append({"url": url, "field": field, "dtype": array.dtype.str, "shape": list(array.shape),
+                               "length": len(data), "compression": "zlib" if self._compress else None})
+
+        payload = pickle.dumps(event, protocol=pickle.HIGHEST_PROTOCOL)
+        views = {url: [float(value) for value in image.view] for url, image in images.items()}
+        header = json.dumps({"topic": topic, "event": len(payload), "views": views, "arrays": layout}).encode("utf-8")
+        length = len(payload) + sum(len(data) for data in arrays)
+
+        with self._lock:
+            self._file.write(_RECORD.pack(timestamp, len(header), length))
+            self._file.write(header)
+            self._file.write(payload)
+            for data in arrays:
+                self._file.write(data)
+
+    def flush(self):
+        with self._lock:
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+class LogImageSource(ImageSource):
+    def __init__(self, image: Image):
+        self._image = image
+
+    def capture(self) -> Image:
+        return self._image
+
+
+class EventLogReader:
+    """
+    Read an event log through a memory map.
+
+    Opening the log only reads the record headers to build an index of the events and
+    images, events and images are read on demand. Uncompressed images are read-only views
+    of the memory map, the map is kept open until they are released.
+    """
+
+    def __init__(self, path: str):
+        self._path = path
+        self._file = open(path, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ValueError(f"{path} is not an event log")
+
+        self._data = memoryview(self._map)
+        if self._data[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not an event log")
+
+        self._records, end = _scan(self._data)
+        if end < len(self._data):
+            logger.warning("Skipped incomplete record at the end of event log %s", self._path)
+        self._images = {url: record for record in self._records for url in record.images}
+
+    def __len__(self):
+        return len(self._records)
+
+    def __iter__(self) -> Iterator[LogRecord]:
+        return iter(self._records)
+
+    @property
+    def records(self) -> List[LogRecord]:
+        return list(self._records)
+
+    @property
+    def duration(self) -> float:
+        return self._records[-1].timestamp - self._records[0].timestamp if self._records else 0.0
+
+    def event(self, record: LogRecord) -> Event:
+        return pickle.loads(self._data[record.offset:record.offset + record.header["event"]])
+
+    def image(self, url: str) -> Image:
+        """
+        The image recorded for the URL.
+
+        Raises
+        ------
+        KeyError
+            If there is no image for the URL in the log.
+        """
+        record = self._images[url]
+
+        arrays = dict()
+        offset = record.offset + record.header["event"]
+        for array in record.header["arrays"]:
+            if array["url"] == url:
+                data = self._data[offset:offset + array["length"]]
+                if array["compression"] == "zlib":
+                    data = zlib.decompress(data)
+                arrays[array["field"]] = np.frombuffer(data, dtype=np.dtype(array["dtype"])).reshape(array["shape"])
+            offset += array["length"]
+
+        return Image(arrays["image"], tuple(record.header["views"][url]), arrays.get("depth"))
+
+    def image_loader(self, url: str) -> ImageSource:
+        """
+        Image loader that serves the recorded images to services.
+        """
+        return LogImageSource(self.image(url))
+
+    def close(self):
+        self._data.release()
+        try:
+            self._map.close()
+        except BufferError:
+            logger.debug("Images of event log %s are still in use, the log is unmapped when they are released",
+                         self._path)
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -0,0 +1,145 @@
+import logging
+import queue
+import threading
+import time
+from typing import Callable, Iterable
+
+from cltl.backend.api.camera import Image
+from cltl.backend.source.client_source import ClientImageSource
+from cltl.combot.infra.config import ConfigurationManager
+from cltl.combot.infra.event import Event, EventBus
+from cltl.combot.infra.resource import ResourceManager
+from cltl_service.frames.cache import FrameCache, shared_frame_cache
+from cltl_service.metrics.registry import MetricsRegistry, shared_metrics
+from cltl_service.recording.log import EventLogWriter
+
+logger = logging.getLogger(__name__)
+
+
+class EventRecorder:
+    """
+    Record the events on a set of topics to an event log.
+
+    Events are time stamped when they are received and written to the log on a background
+    thread, such that recording does not delay the delivery of events to other subscribers.
+    For events on the image topic the referenced image is loaded and stored in the log,
+    which allows to replay the events without the backend.
+    """
+
+    @classmethod
+    def from_config(cls, event_bus: EventBus, resource_manager: ResourceManager, config_manager: ConfigurationManager):
+        config = config_manager.get_config("cltl.recording")
+        path = config.get("path")
+        topics = config.get("topics", multi=True)
+        image_topic = config.get("topic_image") if "topic_image" in config else None
+        compress = config.get_boolean("compress") if "compress" in config else False
+
+        def image_loader(url) -> Image:
+            with ClientImageSource.from_config(config_manager, url) as source:
+                return source.capture()
+
+        return cls(topics, EventLogWriter(path, compress=compress), event_bus,
+                   image_topic=image_topic, image_loader=image_loader,
+                   frame_cache=shared_frame_cache(config_manager), metrics=shared_metrics())
+
+    def __init__(self, topics: Iterable[str], writer: EventLogWriter, event_bus: EventBus,
+                 image_topic: str = None, image_loader: Callable[[str], Image] = None,
+                 frame_cache: FrameCache = None, metrics: MetricsRegistry = None):
+        """
+        Parameters
+        ----------
+        topics : Iterable[str]
+            The topics to record.
+        writer : EventLogWriter
+            The log to write the events to, it is closed when the recorder is stopped.
+        event_bus : EventBus
+            The event bus of the application.
+        image_topic : str
+            Topic with image signal events, if set the images are recorded with the events.
+        image_loader : Callable[[str], Image]
+            Load the image for an image URL, required if `image_topic` is set.
+        frame_cache : FrameCache
+            Shared cache of decoded images, avoids to load images that were already loaded by other services.
+        metrics : MetricsRegistry
+            Registry to report the number of events waiting to be written.
+        """
+        if image_topic and not image_loader:
+            raise ValueError("An image loader is required to record images")
+
+        self._topics = list(dict.fromkeys(topics))
+        if image_topic and image_topic not in self._topics:
+            self._topics.append(image_topic)
+        self._writer = writer
+        self._event_bus = event_bus
+        self._image_topic = image_topic
+        self._image_loader = image_loader
+        self._frame_cache = frame_cache
+        self._metrics = metrics
+
+        self._queue = queue.Queue()
+        self._thread = None
+        self._recorded = 0
+
+    @property
+    def recorded(self) -> int:
+        return self._recorded
+
+    def start(self):
+        if self._metrics:
+            self._metrics.track_queue(self.__class__.__name__, "recording", self._queue.qsize)
+
+        self._thread = threading.Thread(target=self._run, name=self.__class__.__name__, daemon=True)
+        self._thread.start()
+
+        for topic in self._topics:
+            self._event_bus.subscribe(topic, self._receive)
+
+        logger.info("Recording topics %s", self._topics)
+
+    def stop(self):
+        if not self._thread:
+            return
+
+        for topic in self._topics:
+            self._event_bus.unsubscribe(topic, self._receive)
+
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+        self._writer.close()
+
+        logger.info("Recorded %s events", self._recorded)
+
+    def _receive(self, event: Event):
+        self._queue.put((time.time(), event))
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+
+            timestamp, event = item
+            try:
+                self._record(timestamp, event)
+            except:
+                logger.exception("Failed to record event %s", event.id)
+
+    def _record(self, timestamp: float, event: Event):
+        topic = event.metadata.topic
+        images = None
+        if topic == self._image_topic:
+            url = event.payload.signal.files[0]
+            images = {url: self._load_image(url)}
+
+        self._writer.append(timestamp, topic, event, images)
+        self._recorded += 1
+
+        if self._queue.empty():
+            self._writer.flush()
+
+    def _load_image(self, url: str) -> Image:
+        if self._frame_cache:
+            return self._frame_cache.get(url, self._image_loader)
+
+        return self._image_loader(url)
@@ -0,0 +1,94 @@
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Iterable
+
+from cltl.combot.infra.event import EventBus
+from cltl_service.recording.log import EventLogReader
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class ReplayStatistics:
+    events: int
+    duration: float
+    max_lag: float
+
+
+class EventReplayer:
+    """
+    Publish the events of an event log on the event bus, preserving the time between events.
+
+    Services that load images should be configured with :meth:`EventLogReader.image_loader`
+    to obtain the recorded images.
+    """
+
+    def __init__(self, reader: EventLogReader, event_bus: EventBus, speed: float = 1.0,
+                 topics: Iterable[str] = None,
+                 clock: Callable[[], float] = time.perf_counter, sleep: Callable[[float], None] = time.sleep):
+        """
+        Parameters
+        ----------
+        reader : EventLogReader
+            The event log to replay.
+        event_bus : EventBus
+            The event bus to publish the events on.
+        speed : float
+            Factor by which the replay is faster than the recording, zero to publish the events
+            as fast as possible.
+        topics : Iterable[str]
+            Only replay events on these topics, all topics if not set.
+        """
+        if speed < 0:
+            raise ValueError("Replay speed must not be negative, was " + str(speed))
+
+        self._reader = reader
+        self._event_bus = event_bus
+        self._speed = speed
+        self._topics = set(topics) if topics else None
+        self._clock = clock
+        self._sleep = sleep
+
+        self._stopped = threading.Event()
+
+    def replay(self) -> ReplayStatistics:
+        """
+        Replay the log on the calling thread until all events are published or :meth:`stop` is called.
+
+        Returns
+        -------
+        ReplayStatistics
+            The number of published events, the duration of the replay and the maximum delay
+            of an event behind its scheduled time in seconds.
+        """
+        self._stopped.clear()
+
+        records = [record for record in self._reader if not self._topics or record.topic in self._topics]
+
+        count = 0
+        max_lag = 0.0
+        start = self._clock()
+        for record in records:
+            if self._stopped.is_set():
+                break
+
+            if self._speed:
+                scheduled = start + (record.timestamp - records[0].timestamp) / self._speed
+                delay = scheduled - self._clock()
+                if delay > 0:
+                    self._sleep(delay)
+                else:
+                    max_lag = max(max_lag, -delay)
+
+            self._event_bus.publish(record.topic, self._reader.event(record))
+            count += 1
+
+        statistics = ReplayStatistics(count, self._clock() - start, max_lag)
+        logger.info("Replayed %s events in %.1f s", statistics.events, statistics.duration)
+
+        return statistics
+
+    def stop(self):
+        self._stopped.set()
@@ -0,0 +1,128 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+from typing import Callable, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class Deadline:
+    """
+    Handle of a scheduled callback.
+    """
+
+    def __init__(self, due: float, callback: Callable[[], None]):
+        self.due = due
+        self._callback = callback
+        self._cancelled = False
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled
+
+    def cancel(self):
+        """
+        Cancel the callback, has no effect if the callback was already invoked.
+        """
+        self._cancelled = True
+
+
+class DeadlineScheduler:
+    """
+    Invoke one-shot callbacks when their deadline is due.
+
+    Deadlines are kept in a heap and a single thread sleeps until the earliest deadline,
+    such that there are no wakeups while no deadline is due. Callbacks are invoked on the
+    scheduler thread and should therefore return quickly. Cancelled deadlines are removed
+    when they reach the head of the heap.
+    """
+
+    def __init__(self, name: str = None, clock: Callable[[], float] = time.monotonic):
+        self._name = name if name else self.__class__.__name__
+        self._clock = clock
+
+        self._deadlines: List[Tuple[float, int, Deadline]] = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._thread = None
+        self._running = False
+
+    def __len__(self):
+        return len(self._deadlines)
+
+    def schedule(self, delay: float, callback: Callable[[], None]) -> Deadline:
+        """
+        Invoke the callback after `delay` seconds.
+
+        The scheduler thread is started on the first call if the scheduler is not running.
+        """
+        deadline = Deadline(self._clock() + delay, callback)
+        with self._condition:
+            if not self._running:
+                self._start()
+            heapq.heappush(self._deadlines, (deadline.due, next(self._sequence), deadline))
+            if self._deadlines[0][2] is deadline:
+                self._condition.notify()
+
+        return deadline
+
+    def start(self):
+        with self._condition:
+            if not self._running:
+                self._start()
+
+    def _start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name=self._name, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stop the scheduler thread, pending deadlines are discarded.
+        """
+        with self._condition:
+            self._running = False
+            self._deadlines = []
+            self._condition.notify()
+            thread, self._thread = self._thread, None
+
+        if thread and thread is not threading.current_thread():
+            thread.join()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._running and (not self._deadlines or self._deadlines[0][0] > self._clock()):
+                    timeout = self._deadlines[0][0] - self._clock() if self._deadlines else None
+                    self._condition.wait(timeout)
+                if not self._running:
+                    break
+
+                _, _, deadline = heapq.heappop(self._deadlines)
+
+            if deadline.cancelled:
+                continue
+
+            try:
+                deadline._callback()
+            except:
+                logger.exception("Failed to invoke deadline callback in %s", self._name)
+
+
+_shared_scheduler = None
+_shared_scheduler_lock = threading.Lock()
+
+
+def shared_scheduler() -> DeadlineScheduler:
+    """
+    Get the process-wide deadline scheduler.
+    """
+    global _shared_scheduler
+
+    with _shared_scheduler_lock:
+        if _shared_scheduler is None:
+            _shared_scheduler = DeadlineScheduler("SharedDeadlineScheduler")
+
+        return _shared_scheduler
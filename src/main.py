@@ -1,5 +1,13 @@
-from objectref.objectloc.dummy import DummyObjectReference
+import numpy as np
+from cltl.backend.api.camera import Image
+from cltl.combot.infra.config.local import LocalConfigurationContainer
+
+from objectref.objectloc.depth import DepthObjectReference
 
 
 if __name__ == '__main__':
-    print("Location", DummyObjectReference().get_location(None, None))
+    LocalConfigurationContainer.load_configuration()
+    object_reference = DepthObjectReference.from_config(LocalConfigurationContainer().config_manager)
+
+    image = Image(np.zeros((480, 640, 3), dtype=np.uint8), (0, 0, 1, 1), np.full((480, 640), 1500, dtype=np.uint16))
+    print("Location", object_reference.get_location(image, (240, 160, 400, 320)))
@@ -1,15 +1,99 @@
 import abc
-from typing import Tuple, Iterable
+import asyncio
+from concurrent.futures import Executor
+from typing import Tuple, Iterable, Sequence, Union
 
+import numpy as np
 from cltl.backend.api.camera import Image, Bounds
 
 
+BoundsLike = Union[Bounds, Tuple[int, int, int, int]]
+
+
+def to_diagonal(bounds: BoundsLike) -> Tuple[float, float, float, float]:
+    """
+    Convert bounds to a (x0, y0, x1, y1) tuple in pixel coordinates.
+    """
+    return bounds.to_diagonal() if isinstance(bounds, Bounds) else tuple(bounds)
+
+
 class ObjectReference(abc.ABC):
     def get_location(self, image: Image, bounds: Bounds) -> Tuple[float, float, float]:
         raise NotImplementedError()
 
+    def get_locations(self, image: Image, bounds: Sequence[Bounds]) -> np.ndarray:
+        """
+        Resolve the locations of all objects detected in a single image.
+
+        Implementations should override this method to compute the locations
+        in a single pass over the image, by default it falls back to
+        :meth:`get_location` for each of the bounds.
+
+        Parameters
+        ----------
+        image : Image
+            The image in which the objects were detected.
+        bounds : Sequence[Bounds]
+            The bounds of the objects in the image.
+
+        Returns
+        -------
+        np.ndarray
+            Array of shape (N, 3) with the location of each object, in the
+            order of the provided bounds.
+        """
+        return np.array([self.get_location(image, bbox) for bbox in bounds], dtype=float).reshape(-1, 3)
+
     def add_observation(self, image: Image, objects: Iterable[Tuple[str, Tuple[int, int, int, int]]]):
         raise NotImplementedError()
 
     def process_utterance(self, utterance: str) -> str:
-        raise NotImplementedError()
\ No newline at end of file
+        raise NotImplementedError()
+
+
+class AsyncObjectReference(abc.ABC):
+    """
+    Coroutine based variant of :class:`ObjectReference`.
+
+    Implementations must not block the event loop, long running computations
+    should be delegated to an executor.
+    """
+    async def get_location(self, image: Image, bounds: Bounds) -> Tuple[float, float, float]:
+        raise NotImplementedError()
+
+    async def get_locations(self, image: Image, bounds: Sequence[Bounds]) -> np.ndarray:
+        locations = await asyncio.gather(*(self.get_location(image, bbox) for bbox in bounds))
+
+        return np.array(locations, dtype=float).reshape(-1, 3)
+
+    async def add_observation(self, image: Image, objects: Iterable[Tuple[str, Tuple[int, int, int, int]]]):
+        raise NotImplementedError()
+
+    async def process_utterance(self, utterance: str) -> str:
+        raise NotImplementedError()
+
+
+class AsyncObjectReferenceAdapter(AsyncObjectReference):
+    """
+    Run the methods of a synchronous :class:`ObjectReference` in an executor.
+
+    The wrapped ObjectReference must be thread-safe if the executor runs more than one thread.
+    """
+    def __init__(self, object_reference: ObjectReference, executor: Executor = None):
+        self._object_reference = object_reference
+        self._executor = executor
+
+    async def get_location(self, image: Image, bounds: Bounds) -> Tuple[float, float, float]:
+        return await self._run(self._object_reference.get_location, image, bounds)
+
+    async def get_locations(self, image: Image, bounds: Sequence[Bounds]) -> np.ndarray:
+        return await self._run(self._object_reference.get_locations, image, bounds)
+
+    async def add_observation(self, image: Image, objects: Iterable[Tuple[str, Tuple[int, int, int, int]]]):
+        return await self._run(self._object_reference.add_observation, image, list(objects))
+
+    async def process_utterance(self, utterance: str) -> str:
+        return await self._run(self._object_reference.process_utterance, utterance)
+
+    def _run(self, method, *args):
+        return asyncio.get_running_loop().run_in_executor(self._executor, method, *args)
@@ -0,0 +1,196 @@
+import logging
+import math
+from dataclasses import dataclass
+from typing import Tuple, Iterable, Sequence, Optional
+
+import numpy as np
+from cltl.backend.api.camera import Image
+from cltl.combot.infra.config import ConfigurationManager
+from cltl.combot.infra.time_util import timestamp_now
+
+from objectref.objectloc.api import ObjectReference, BoundsLike, to_diagonal
+from objectref.objectloc.reference import ReferenceResolver
+from objectref.objectloc.store import ObjectStore
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class CameraIntrinsics:
+    """
+    Pinhole camera intrinsics in pixel units of the RGB image.
+    """
+    fx: float
+    fy: float
+    cx: float
+    cy: float
+
+    @classmethod
+    def from_fov(cls, width: int, height: int, horizontal_fov: float):
+        """
+        Approximate the intrinsics from the image size and the horizontal field of view in degrees,
+        assuming square pixels and the principal point in the image center.
+        """
+        focal_length = (width / 2) / math.tan(math.radians(horizontal_fov) / 2)
+
+        return cls(focal_length, focal_length, width / 2, height / 2)
+
+
+class DepthObjectReference(ObjectReference):
+    """
+    Localize objects by back-projecting their bounding boxes using the depth channel of the image.
+
+    The depth of an object is estimated as a percentile of the valid depth values within its
+    bounding box, which is robust against background and invalid pixels at the box borders.
+    To keep the cost independent of the image resolution, depth is sampled on a fixed grid of
+    `samples` x `samples` pixels per bounding box, and all bounding boxes of a frame are
+    processed in a single vectorized pass.
+    """
+
+    @classmethod
+    def from_config(cls, config_manager: ConfigurationManager):
+        config = config_manager.get_config("objectref.objectloc.depth")
+
+        intrinsics = None
+        if all(key in config for key in ("fx", "fy", "cx", "cy")):
+            intrinsics = CameraIntrinsics(config.get_float("fx"), config.get_float("fy"),
+                                          config.get_float("cx"), config.get_float("cy"))
+
+        kwargs = {key: config.get_float(key)
+                  for key in ("horizontal_fov", "percentile", "depth_scale", "min_depth", "max_depth")
+                  if key in config}
+        if "samples" in config:
+            kwargs["samples"] = config.get_int("samples")
+
+        store = ObjectStore(**{key: config.get_float(key)
+                               for key in ("cell_size", "merge_distance") if key in config})
+        resolver = ReferenceResolver(store, **{key: config.get_float(key)
+                                               for key in ("relation_radius", "near_distance") if key in config})
+
+        return cls(intrinsics, store=store, resolver=resolver, **kwargs)
+
+    def __init__(self, intrinsics: Optional[CameraIntrinsics] = None, horizontal_fov: float = 60.0,
+                 percentile: float = 50.0, samples: int = 16, depth_scale: float = 1.0,
+                 min_depth: float = 0.0, max_depth: float = math.inf, store: ObjectStore = None,
+                 resolver: ReferenceResolver = None):
+        """
+        Parameters
+        ----------
+        intrinsics : Optional[CameraIntrinsics]
+            The camera intrinsics. If not provided, they are approximated from the
+            image size and the `horizontal_fov`.
+        horizontal_fov : float
+            Horizontal field of view of the camera in degrees.
+        percentile : float
+            Percentile of the depth values within a bounding box used as object depth.
+        samples : int
+            Number of depth samples per bounding box along each axis.
+        depth_scale : float
+            Factor to convert raw depth values to the unit of the returned locations.
+        min_depth : float
+            Depth values (after scaling) below or equal to this value are treated as invalid.
+        max_depth : float
+            Depth values (after scaling) above this value are treated as invalid.
+        store : ObjectStore
+            Store for the observed objects.
+        resolver : ReferenceResolver
+            Resolver for references to objects in the store.
+        """
+        if not 0 <= percentile <= 100:
+            raise ValueError("percentile must be in [0, 100], was " + str(percentile))
+        if samples < 1:
+            raise ValueError("samples must be positive, was " + str(samples))
+
+        self._intrinsics = intrinsics
+        self._horizontal_fov = horizontal_fov
+        self._percentile = percentile
+        self._samples = samples
+        self._depth_scale = depth_scale
+        self._min_depth = min_depth
+        self._max_depth = max_depth
+        self._store = store if store is not None else ObjectStore()
+        self._resolver = resolver if resolver is not None else ReferenceResolver(self._store)
+
+    @property
+    def store(self) -> ObjectStore:
+        return self._store
+
+    def get_location(self, image: Image, bounds: BoundsLike) -> Tuple[float, float, float]:
+        return tuple(self.get_locations(image, [bounds])[0].tolist())
+
+    def get_locations(self, image: Image, bounds: Sequence[BoundsLike]) -> np.ndarray:
+        boxes = np.array([to_diagonal(bbox) for bbox in bounds], dtype=float).reshape(-1, 4)
+        if image.depth is None:
+            logger.warning("No depth information available for image, cannot localize %s objects", len(boxes))
+            return np.full((len(boxes), 3), np.nan)
+
+        height, width = image.image.shape[:2]
+        np.clip(boxes[:, 0::2], 0, width, out=boxes[:, 0::2])
+        np.clip(boxes[:, 1::2], 0, height, out=boxes[:, 1::2])
+
+        depth = self._box_depth(image.depth, boxes, width, height)
+
+        intrinsics = self._intrinsics if self._intrinsics else CameraIntrinsics.from_fov(width, height,
+                                                                                       self._horizontal_fov)
+        u = (boxes[:, 0] + boxes[:, 2]) / 2
+        v = (boxes[:, 1] + boxes[:, 3]) / 2
+        x = (u - intrinsics.cx) * depth / intrinsics.fx
+        y = (v - intrinsics.cy) * depth / intrinsics.fy
+
+        return np.stack((x, y, depth), axis=1)
+
+    def _box_depth(self, depth_map: np.ndarray, boxes: np.ndarray, width: int, height: int) -> np.ndarray:
+        depth_height, depth_width = depth_map.shape[:2]
+
+        # Sample pixel centers on a regular grid within each box, in depth map coordinates
+        steps = (np.arange(self._samples) + 0.5) / self._samples
+        xs = boxes[:, 0, None] + (boxes[:, 2] - boxes[:, 0])[:, None] * steps
+        ys = boxes[:, 1, None] + (boxes[:, 3] - boxes[:, 1])[:, None] * steps
+        xs = np.clip((xs * (depth_width / width)).astype(np.intp), 0, depth_width - 1)
+        ys = np.clip((ys * (depth_height / height)).astype(np.intp), 0, depth_height - 1)
+
+        samples = depth_map[ys[:, :, None], xs[:, None, :]].reshape(len(boxes), self._samples ** 2).astype(float)
+        samples *= self._depth_scale
+
+        valid = (samples > self._min_depth) & (samples <= self._max_depth)
+        valid &= (boxes[:, 2] > boxes[:, 0])[:, None] & (boxes[:, 3] > boxes[:, 1])[:, None]
+        samples[~valid] = np.inf
+        samples.sort(axis=1)
+
+        counts = valid.sum(axis=1)
+        ranks = np.floor(np.maximum(counts - 1, 0) * self._percentile / 100).astype(np.intp)
+        depth = samples[np.arange(len(boxes)), ranks]
+        depth[counts == 0] = np.nan
+
+        return depth
+
+    def add_observation(self, image: Image, objects: Iterable[Tuple[str, Tuple[int, int, int, int]]]):
+        objects = list(objects)
+        if not objects:
+            return
+
+        locations = self.get_locations(image, [bbox for _, bbox in objects])
+        localized = ~np.isnan(locations).any(axis=1)
+        if not localized.all():
+            logger.debug("Skipped %s objects without valid depth", (~localized).sum())
+
+        labels = [label for (label, _), valid in zip(objects, localized) if valid]
+        self._store.add_all(labels, locations[localized], timestamp_now())
+
+    def process_utterance(self, utterance: str) -> str:
+        reference = self._resolver.parse(utterance)
+        if not reference:
+            return "I don't know which object you mean."
+
+        description = reference.label
+        if reference.relation:
+            description += f" {reference.relation.value} " + (f"the {reference.landmark}" if reference.landmark else "that")
+
+        matches = self._resolver.resolve(reference)
+        if not matches:
+            return f"I have not seen the {description}."
+
+        x, y, z = matches[0].location
+
+        return f"The {description} is at ({x:.2f}, {y:.2f}, {z:.2f})."
+
@@ -1,5 +1,6 @@
-from typing import Tuple, Iterable
+from typing import Tuple, Iterable, Sequence
 
+import numpy as np
 from cltl.backend.api.camera import Image, Bounds
 
 from objectref.objectloc.api import ObjectReference
@@ -14,4 +15,7 @@ class DummyObjectReference(ObjectReference):
         return f"You said {utterance}"
 
     def get_location(self, image: Image, bounds: Bounds) -> Tuple[float, float, float]:
-        return (0, 0, 0)
\ No newline at end of file
+        return (0, 0, 0)
+
+    def get_locations(self, image: Image, bounds: Sequence[Bounds]) -> np.ndarray:
+        return np.zeros((len(bounds), 3))
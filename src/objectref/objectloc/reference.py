@@ -0,0 +1,231 @@
+import enum
+import logging
+import re
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from objectref.objectloc.store import ObjectStore, WorldObject
+
+logger = logging.getLogger(__name__)
+
+
+class Relation(enum.Enum):
+    """
+    Spatial relations between objects, in the camera frame (x right, y down, z forward).
+    """
+    LEFT_OF = "left of"
+    RIGHT_OF = "right of"
+    ABOVE = "above"
+    BELOW = "below"
+    IN_FRONT_OF = "in front of"
+    BEHIND = "behind"
+    NEAR = "near"
+
+
+RELATION_PHRASES = {
+    "left of": Relation.LEFT_OF,
+    "to the left of": Relation.LEFT_OF,
+    "right of": Relation.RIGHT_OF,
+    "to the right of": Relation.RIGHT_OF,
+    "above": Relation.ABOVE,
+    "over": Relation.ABOVE,
+    "on top of": Relation.ABOVE,
+    "on": Relation.ABOVE,
+    "below": Relation.BELOW,
+    "under": Relation.BELOW,
+    "underneath": Relation.BELOW,
+    "beneath": Relation.BELOW,
+    "in front of": Relation.IN_FRONT_OF,
+    "before": Relation.IN_FRONT_OF,
+    "behind": Relation.BEHIND,
+    "near": Relation.NEAR,
+    "next to": Relation.NEAR,
+    "close to": Relation.NEAR,
+    "beside": Relation.NEAR,
+    "by": Relation.NEAR,
+}
+
+
+@dataclass(frozen=True)
+class Reference:
+    """
+    Parsed referring expression: the target label and optionally a relation to a landmark label.
+    """
+    label: str
+    relation: Optional[Relation] = None
+    landmark: Optional[str] = None
+
+
+def relation_holds(offsets: np.ndarray, relation: Relation, margin: float, near_distance: float) -> np.ndarray:
+    """
+    Whether a relation holds for objects at the given offsets from their landmarks.
+
+    Parameters
+    ----------
+    offsets : np.ndarray
+        Array of shape (..., 3) with the location of an object minus the location of a landmark.
+
+    Returns
+    -------
+    np.ndarray
+        Boolean array of shape (...).
+    """
+    dx, dy, dz = offsets[..., 0], offsets[..., 1], offsets[..., 2]
+    if relation == Relation.LEFT_OF:
+        return dx < -margin
+    if relation == Relation.RIGHT_OF:
+        return dx > margin
+    if relation == Relation.ABOVE:
+        return dy < -margin
+    if relation == Relation.BELOW:
+        return dy > margin
+    if relation == Relation.IN_FRONT_OF:
+        return dz < -margin
+    if relation == Relation.BEHIND:
+        return dz > margin
+    if relation == Relation.NEAR:
+        return np.linalg.norm(offsets, axis=-1) <= near_distance
+
+    raise ValueError("Unsupported relation " + str(relation))
+
+
+class ReferenceResolver:
+    """
+    Resolve referring expressions like "the cup left of the laptop" against an :class:`ObjectStore`.
+
+    Candidates and landmarks are looked up in the label index of the store, and the relation
+    is evaluated in one vectorized pass over the offsets between their locations when the
+    reference is resolved. The cost of resolving a reference therefore only depends on the
+    number of objects with the labels in the reference, not on the number of stored objects,
+    and adding objects to the store requires no additional work.
+    """
+
+    def __init__(self, store: ObjectStore, relation_radius: float = 2.0, near_distance: float = 0.5,
+                 margin: float = 0.05, chunk_size: int = 256):
+        """
+        Parameters
+        ----------
+        store : ObjectStore
+            The store with the remembered objects.
+        relation_radius : float
+            Candidates that are in relation to a landmark within this distance are preferred,
+            only if there are none, candidates in relation to a landmark further away are returned.
+        near_distance : float
+            Maximum distance between two objects to be considered near each other.
+        margin : float
+            Minimum offset along an axis for a directional relation to hold.
+        chunk_size : int
+            Number of candidates evaluated at once, bounds the memory used to resolve a reference.
+        """
+        self._store = store
+        self._relation_radius = relation_radius
+        self._near_distance = near_distance
+        self._margin = margin
+        self._chunk_size = chunk_size
+
+        self._label_key: Tuple[str, ...] = ()
+        self._label_phrases: Dict[str, str] = dict()
+        self._max_label_length = 0
+        self._lock = threading.Lock()
+
+        self._max_phrase_length = max(len(phrase.split()) for phrase in RELATION_PHRASES)
+
+    def parse(self, utterance: str) -> Optional[Reference]:
+        """
+        Find the target label, relation and landmark label in an utterance.
+
+        Labels and relation phrases are matched on token n-grams, the first label in the
+        utterance is the target, the first label after the relation phrase the landmark.
+        """
+        tokens = _tokenize(utterance)
+        labels, max_label_length = self._labels()
+
+        target, relation, landmark = None, None, None
+        idx = 0
+        while idx < len(tokens):
+            label, length = self._match(tokens, idx, max_label_length, lambda phrase: self._label(phrase, labels))
+            if label and not target:
+                target = label
+            elif label and relation:
+                landmark = label
+                break
+            elif not label and target and not relation:
+                relation, length = self._match(tokens, idx, self._max_phrase_length, RELATION_PHRASES.get)
+
+            idx += max(length, 1)
+
+        if not target:
+            return None
+
+        return Reference(target, relation, landmark)
+
+    def resolve(self, reference: Reference) -> List[WorldObject]:
+        """
+        Find the objects matching a reference.
+
+        Returns
+        -------
+        List[WorldObject]
+            The matching objects, the best match first.
+        """
+        candidates = self._store.with_label(reference.label)
+        if not reference.relation:
+            return sorted(candidates, key=lambda obj: (-obj.observations, -obj.last_seen))
+
+        if not reference.landmark:
+            return []
+
+        landmarks = self._store.with_label(reference.landmark)
+        if not candidates or not landmarks:
+            return []
+
+        landmark_locations = np.array([landmark.location for landmark in landmarks])
+        distances = np.empty(len(candidates))
+        for start in range(0, len(candidates), self._chunk_size):
+            chunk = candidates[start:start + self._chunk_size]
+            offsets = np.array([candidate.location for candidate in chunk])[:, None, :] - landmark_locations
+            holds = relation_holds(offsets, reference.relation, self._margin, self._near_distance)
+            distances[start:start + len(chunk)] = np.where(holds, np.linalg.norm(offsets, axis=2), np.inf).min(axis=1)
+
+        in_radius = distances <= self._relation_radius
+        selected = np.flatnonzero(in_radius if in_radius.any() else np.isfinite(distances))
+
+        return [candidates[idx] for idx in selected[np.argsort(distances[selected], kind="stable")]]
+
+    def _labels(self) -> Tuple[Dict[str, str], int]:
+        """
+        Labels of the store by their normalized phrase, rebuilt only when the labels in the store changed.
+        """
+        labels = tuple(self._store.labels)
+        with self._lock:
+            if labels != self._label_key:
+                self._label_phrases = {" ".join(_tokenize(label)): label for label in labels}
+                self._max_label_length = max((len(phrase.split()) for phrase in self._label_phrases), default=0)
+                self._label_key = labels
+
+            return self._label_phrases, self._max_label_length
+
+    @staticmethod
+    def _match(tokens: List[str], start: int, max_length: int, lookup):
+        for length in range(min(max_length, len(tokens) - start), 0, -1):
+            match = lookup(" ".join(tokens[start:start + length]))
+            if match:
+                return match, length
+
+        return None, 0
+
+    @staticmethod
+    def _label(phrase: str, labels: Dict[str, str]) -> Optional[str]:
+        if phrase in labels:
+            return labels[phrase]
+        if phrase.endswith("s") and phrase[:-1] in labels:
+            return labels[phrase[:-1]]
+
+        return None
+
+
+def _tokenize(text: str) -> List[str]:
+    return re.findall(r"[a-z]+", text.lower())
@@ -0,0 +1,278 @@
+import functools
+import itertools
+import math
+import operator
+import threading
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Tuple, Dict, List, Optional, Callable, Iterator, Iterable, Set
+
+import numpy as np
+
+
+Point = Tuple[float, float, float]
+Cell = Tuple[int, int, int]
+
+
+@dataclass
+class WorldObject:
+    """
+    An object in the world, aggregated over all observations that were attributed to it.
+    """
+    id: int
+    label: str
+    location: Point
+    observations: int
+    first_seen: int
+    last_seen: int
+
+
+class SpatialGrid:
+    """
+    Uniform grid spatial index over points in 3D.
+
+    Points are hashed to cubic cells of `cell_size`, only non-empty cells are stored.
+    Inserts, moves and removals are O(1), radius and nearest neighbour queries only
+    visit the cells around the query point. The cell size should be in the order of
+    the typical query radius.
+    """
+
+    def __init__(self, cell_size: float):
+        if cell_size <= 0:
+            raise ValueError("cell_size must be positive, was " + str(cell_size))
+
+        self._cell_size = cell_size
+        self._cells: Dict[Cell, List[int]] = defaultdict(list)
+        self._points: Dict[int, Point] = dict()
+        self._lower = None
+        self._upper = None
+
+    def __len__(self):
+        return len(self._points)
+
+    def __contains__(self, key: int):
+        return key in self._points
+
+    def insert(self, key: int, point: Point):
+        if key in self._points:
+            raise ValueError(f"Key {key} is already in the index")
+
+        point = tuple(float(coordinate) for coordinate in point)
+        cell = self._cell(point)
+        self._cells[cell].append(key)
+        self._points[key] = point
+
+        self._lower = cell if self._lower is None else tuple(map(min, self._lower, cell))
+        self._upper = cell if self._upper is None else tuple(map(max, self._upper, cell))
+
+    def remove(self, key: int):
+        cell = self._cell(self._points.pop(key))
+        self._cells[cell].remove(key)
+        if not self._cells[cell]:
+            del self._cells[cell]
+
+    def move(self, key: int, point: Point):
+        self.remove(key)
+        self.insert(key, point)
+
+    def within(self, point: Point, radius: float) -> List[Tuple[int, float]]:
+        """
+        Find all points within `radius` of `point`.
+
+        Returns
+        -------
+        List[Tuple[int, float]]
+            Keys and distances of the points within the radius, ordered by distance.
+        """
+        if not self._points:
+            return []
+
+        # Only cells within the bounds of the occupied cells can contain points
+        low = tuple(self._clamp((coordinate - radius) / self._cell_size, lower, upper)
+                    for coordinate, lower, upper in zip(point, self._lower, self._upper))
+        high = tuple(self._clamp((coordinate + radius) / self._cell_size, lower, upper)
+                     for coordinate, lower, upper in zip(point, self._lower, self._upper))
+
+        # Scan the occupied cells directly if the query covers more cells than are occupied
+        if functools.reduce(operator.mul, (hi - lo + 1 for lo, hi in zip(low, high)), 1) > len(self._cells):
+            cells = [cell for cell in self._cells if all(lo <= c <= hi for c, lo, hi in zip(cell, low, high))]
+        else:
+            cells = [cell for cell in itertools.product(*(range(lo, hi + 1) for lo, hi in zip(low, high)))
+                     if cell in self._cells]
+
+        candidates = [key for cell in cells for key in self._cells[cell]]
+
+        return self._closest(point, candidates, radius)
+
+    def nearest(self, point: Point, max_distance: float = math.inf,
+                accept: Callable[[int], bool] = None) -> Optional[Tuple[int, float]]:
+        """
+        Find the nearest point to `point`.
+
+        Cells are searched in shells of increasing distance around the cell of the query
+        point, the search stops as soon as no closer point can be found in the next shell.
+
+        Parameters
+        ----------
+        point : Point
+            The query point.
+        max_distance : float
+            Only consider points within this distance.
+        accept : Callable[[int], bool]
+            Optional filter on the keys of the points to consider.
+
+        Returns
+        -------
+        Optional[Tuple[int, float]]
+            Key and distance of the nearest point, or None if there is no point in range.
+        """
+        if not self._points:
+            return None
+
+        center = self._cell(point)
+        max_ring = max(max(abs(c - lo), abs(hi - c)) for c, lo, hi in zip(center, self._lower, self._upper))
+        if max_distance < math.inf:
+            max_ring = min(max_ring, int(max_distance // self._cell_size) + 1)
+
+        best = None
+        for ring in range(max_ring + 1):
+            # Scan the occupied cells directly once the shell gets larger than the index
+            exhaustive = (2 * ring + 1) ** 3 - max(2 * ring - 1, 0) ** 3 > len(self._cells)
+            if exhaustive:
+                cells = [cell for cell in self._cells
+                         if max(abs(c - o) for c, o in zip(cell, center)) >= ring]
+            else:
+                cells = [cell for cell in self._shell(center, ring) if cell in self._cells]
+
+            candidates = [key for cell in cells for key in self._cells[cell] if accept is None or accept(key)]
+            closest = self._closest(point, candidates, max_distance, limit=1)
+            if closest and (best is None or closest[0][1] < best[1]):
+                best = closest[0]
+
+            # Points in the next shell are at least `ring` cells away
+            if exhaustive or (best is not None and best[1] <= ring * self._cell_size):
+                break
+
+        return best
+
+    def _closest(self, point: Point, keys: List[int], radius: float, limit: int = None) -> List[Tuple[int, float]]:
+        if not keys:
+            return []
+
+        distances = np.linalg.norm(np.array([self._points[key] for key in keys]) - point, axis=1)
+        in_range = np.flatnonzero(distances <= radius)
+        order = in_range[np.argsort(distances[in_range], kind="stable")[:limit]]
+
+        return [(keys[idx], float(distances[idx])) for idx in order]
+
+    @staticmethod
+    def _clamp(cell: float, lower: int, upper: int) -> int:
+        return int(math.floor(min(max(cell, lower), upper)))
+
+    def _cell(self, point: Point) -> Cell:
+        return tuple(int(math.floor(coordinate / self._cell_size)) for coordinate in point)
+
+    @staticmethod
+    def _shell(center: Cell, ring: int) -> Iterator[Cell]:
+        if ring == 0:
+            yield center
+            return
+
+        x, y, z = center
+        for dx in range(-ring, ring + 1):
+            for dy in range(-ring, ring + 1):
+                if abs(dx) == ring or abs(dy) == ring:
+                    dzs = range(-ring, ring + 1)
+                else:
+                    dzs = (-ring, ring)
+                for dz in dzs:
+                    yield x + dx, y + dy, z + dz
+
+
+class ObjectStore:
+    """
+    Thread-safe store of the objects observed during a session.
+
+    Observations are merged into an existing object with the same label if one is
+    within `merge_distance`, otherwise a new object is created. Objects are indexed
+    in a :class:`SpatialGrid` and by label, so merging and spatial queries do not
+    depend on the number of stored objects.
+    """
+
+    def __init__(self, cell_size: float = 0.5, merge_distance: float = 0.2):
+        self._grid = SpatialGrid(cell_size)
+        self._merge_distance = merge_distance
+        self._objects: Dict[int, WorldObject] = dict()
+        self._labels: Dict[str, Set[int]] = defaultdict(set)
+        self._ids = itertools.count()
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._objects)
+
+    def __iter__(self) -> Iterator[WorldObject]:
+        with self._lock:
+            return iter(list(self._objects.values()))
+
+    def get(self, object_id: int) -> WorldObject:
+        return self._objects[object_id]
+
+    @property
+    def labels(self) -> List[str]:
+        """
+        Snapshot of the labels of the objects in the store.
+        """
+        with self._lock:
+            return list(self._labels.keys())
+
+    def with_label(self, label: str) -> List[WorldObject]:
+        with self._lock:
+            return [self._objects[key] for key in self._labels.get(label, ())]
+
+    def add(self, label: str, location: Point, timestamp: int) -> WorldObject:
+        """
+        Add an observation of an object with the given label at a location.
+
+        Returns
+        -------
+        WorldObject
+            The object the observation was attributed to.
+        """
+        with self._lock:
+            match = self._grid.nearest(location, self._merge_distance,
+                                       accept=lambda key: self._objects[key].label == label)
+            if match is None:
+                world_object = WorldObject(next(self._ids), label, tuple(map(float, location)), 1, timestamp, timestamp)
+                self._objects[world_object.id] = world_object
+                self._labels[label].add(world_object.id)
+                self._grid.insert(world_object.id, world_object.location)
+
+                return world_object
+
+            world_object = self._objects[match[0]]
+            count = world_object.observations
+            world_object.location = tuple(((count * np.array(world_object.location) + location) / (count + 1)).tolist())
+            world_object.observations = count + 1
+            world_object.last_seen = timestamp
+            self._grid.move(world_object.id, world_object.location)
+
+            return world_object
+
+    def add_all(self, labels: Iterable[str], locations: np.ndarray, timestamp: int) -> List[WorldObject]:
+        with self._lock:
+            return [self.add(label, location, timestamp) for label, location in zip(labels, locations)]
+
+    def nearest(self, location: Point, label: str = None, max_distance: float = math.inf) -> Optional[WorldObject]:
+        with self._lock:
+            if label and label not in self._labels:
+                return None
+
+            accept = (lambda key: self._objects[key].label == label) if label else None
+            match = self._grid.nearest(location, max_distance, accept=accept)
+
+            return self._objects[match[0]] if match else None
+
+    def within(self, location: Point, radius: float, label: str = None) -> List[WorldObject]:
+        with self._lock:
+            return [self._objects[key] for key, _ in self._grid.within(location, radius)
+                    if not label or self._objects[key].label == label]
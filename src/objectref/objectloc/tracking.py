@@ -0,0 +1,252 @@
+import itertools
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from objectref.objectloc.api import BoundsLike, to_diagonal
+
+logger = logging.getLogger(__name__)
+
+
+try:
+    from scipy.optimize import linear_sum_assignment
+except ImportError:
+    linear_sum_assignment = None
+
+
+@dataclass
+class Track:
+    id: int
+    label: str
+    bounds: Tuple[float, float, float, float]
+    reported: Optional[Tuple[float, float, float, float]] = None
+    hits: int = 1
+    misses: int = 0
+
+
+@dataclass(frozen=True)
+class TrackedObject:
+    """
+    A detection associated to a track.
+
+    `changed` is True if the track was not reported yet or the object moved since it was last reported.
+    """
+    track_id: int
+    label: str
+    bounds: BoundsLike
+    changed: bool
+
+
+def iou_matrix(boxes_a: np.ndarray, boxes_b: np.ndarray) -> np.ndarray:
+    """
+    Pairwise intersection over union of two arrays of (x0, y0, x1, y1) boxes.
+
+    Returns
+    -------
+    np.ndarray
+        Array of shape (len(boxes_a), len(boxes_b)).
+    """
+    a = boxes_a[:, None, :]
+    b = boxes_b[None, :, :]
+
+    width = np.clip(np.minimum(a[..., 2], b[..., 2]) - np.maximum(a[..., 0], b[..., 0]), 0, None)
+    height = np.clip(np.minimum(a[..., 3], b[..., 3]) - np.maximum(a[..., 1], b[..., 1]), 0, None)
+    intersection = width * height
+
+    area_a = (a[..., 2] - a[..., 0]) * (a[..., 3] - a[..., 1])
+    area_b = (b[..., 2] - b[..., 0]) * (b[..., 3] - b[..., 1])
+    union = area_a + area_b - intersection
+
+    return np.divide(intersection, union, out=np.zeros_like(intersection), where=union > 0)
+
+
+def _hungarian(cost: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Minimum cost assignment for a cost matrix with at most as many rows as columns,
+    using shortest augmenting paths in O(rows^2 * columns).
+    """
+    rows, cols = cost.shape
+    u = np.zeros(rows + 1)
+    v = np.zeros(cols + 1)
+    assignment = np.zeros(cols + 1, dtype=int)
+    way = np.zeros(cols + 1, dtype=int)
+
+    for row in range(1, rows + 1):
+        assignment[0] = row
+        col = 0
+        min_slack = np.full(cols + 1, np.inf)
+        used = np.zeros(cols + 1, dtype=bool)
+        while assignment[col] != 0:
+            used[col] = True
+            current = assignment[col]
+            slack = cost[current - 1] - u[current] - v[1:]
+            improved = ~used[1:] & (slack < min_slack[1:])
+            min_slack[1:][improved] = slack[improved]
+            way[1:][improved] = col
+
+            free = np.flatnonzero(~used[1:]) + 1
+            next_col = free[np.argmin(min_slack[free])]
+            delta = min_slack[next_col]
+
+            u[assignment[used]] += delta
+            v[used] -= delta
+            min_slack[~used] -= delta
+            col = next_col
+
+        while col:
+            previous = way[col]
+            assignment[col] = assignment[previous]
+            col = previous
+
+    cols_assigned = np.flatnonzero(assignment[1:]) + 1
+    row_indices = assignment[cols_assigned] - 1
+    order = np.argsort(row_indices)
+
+    return row_indices[order], cols_assigned[order] - 1
+
+
+def assign(cost: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Optimal assignment of rows to columns minimizing the total cost.
+
+    Uses scipy if it is available.
+    """
+    if cost.size == 0:
+        return np.empty(0, dtype=int), np.empty(0, dtype=int)
+
+    if linear_sum_assignment is not None:
+        return linear_sum_assignment(cost)
+
+    if cost.shape[0] > cost.shape[1]:
+        cols, rows = _hungarian(cost.T)
+        order = np.argsort(rows)
+        return rows[order], cols[order]
+
+    return _hungarian(cost)
+
+
+class ObjectTracker:
+    """
+    Associate object detections across frames to tracks with stable identifiers.
+
+    Detections are assigned to the existing tracks with the same label by an optimal
+    assignment on their intersection over union (IoU) with the last known bounds of the
+    track. Tracks that are not matched for more than `max_age` consecutive frames are removed.
+
+    Tracks are not marked as reported by :meth:`update`, as the frame may still be dropped
+    before it is processed. Once the changed objects of a frame are processed they are marked
+    with :meth:`report`, until then they are reported as changed for later frames as well.
+    """
+
+    def __init__(self, iou_threshold: float = 0.3, moved_threshold: float = 0.7, max_age: int = 30):
+        """
+        Parameters
+        ----------
+        iou_threshold : float
+            Minimum IoU of a detection with a track to be associated with it.
+        moved_threshold : float
+            A tracked object is reported as changed if the IoU of its bounds with the bounds
+            it was last reported with drops below this value.
+        max_age : int
+            Number of consecutive frames without a matching detection after which a track is removed.
+        """
+        self._iou_threshold = iou_threshold
+        self._moved_threshold = moved_threshold
+        self._max_age = max_age
+
+        self._tracks: List[Track] = []
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+
+    @property
+    def tracks(self) -> List[Track]:
+        with self._lock:
+            return list(self._tracks)
+
+    def update(self, objects: Sequence[Tuple[str, BoundsLike]]) -> List[TrackedObject]:
+        """
+        Update the tracks with the detections of a frame.
+
+        Parameters
+        ----------
+        objects : Sequence[Tuple[str, BoundsLike]]
+            Label and bounds of the objects detected in the frame.
+
+        Returns
+        -------
+        List[TrackedObject]
+            The detections with their track, in the order of `objects`.
+        """
+        with self._lock:
+            return self._update(objects)
+
+    def changed(self, tracked: Iterable[TrackedObject]) -> List[TrackedObject]:
+        """
+        The tracked objects that were not reported yet or moved since they were last reported.
+
+        Use this when the frame is processed, as tracks may have been reported in the meantime.
+        """
+        with self._lock:
+            tracks = {track.id: track for track in self._tracks}
+
+            return [obj for obj in tracked
+                    if obj.track_id not in tracks or self._moved(tracks[obj.track_id], to_diagonal(obj.bounds))]
+
+    def report(self, tracked: Iterable[TrackedObject]):
+        """
+        Mark the tracked objects as reported with their current bounds.
+        """
+        with self._lock:
+            tracks = {track.id: track for track in self._tracks}
+            for obj in tracked:
+                if obj.track_id in tracks:
+                    tracks[obj.track_id].reported = tuple(float(x) for x in to_diagonal(obj.bounds))
+
+    def _moved(self, track: Track, box) -> bool:
+        if track.reported is None:
+            return True
+
+        return iou_matrix(np.array([track.reported]), np.array([box], dtype=float))[0, 0] < self._moved_threshold
+
+    def _update(self, objects: Sequence[Tuple[str, BoundsLike]]) -> List[TrackedObject]:
+        labels = np.array([label for label, _ in objects], dtype=object)
+        boxes = np.array([to_diagonal(bounds) for _, bounds in objects], dtype=float).reshape(-1, 4)
+        track_labels = np.array([track.label for track in self._tracks], dtype=object)
+        track_boxes = np.array([track.bounds for track in self._tracks], dtype=float).reshape(-1, 4)
+
+        iou = iou_matrix(track_boxes, boxes)
+        iou[track_labels[:, None] != labels[None, :]] = 0.0
+
+        track_indices, detection_indices = assign(1.0 - iou)
+        matched = iou[track_indices, detection_indices] >= self._iou_threshold
+
+        detection_tracks = dict(zip(detection_indices[matched].tolist(), track_indices[matched].tolist()))
+        matched_tracks = set(detection_tracks.values())
+
+        result = []
+        for idx, (label, bounds) in enumerate(objects):
+            box = tuple(boxes[idx].tolist())
+            if idx in detection_tracks:
+                track = self._tracks[detection_tracks[idx]]
+                track.bounds = box
+                track.hits += 1
+                track.misses = 0
+            else:
+                track = Track(next(self._ids), label, box)
+                self._tracks.append(track)
+
+            result.append(TrackedObject(track.id, label, bounds, bool(self._moved(track, box))))
+
+        for idx, track in enumerate(self._tracks[:len(track_labels)]):
+            if idx not in matched_tracks:
+                track.misses += 1
+
+        expired = [track for track in self._tracks if track.misses > self._max_age]
+        if expired:
+            self._tracks = [track for track in self._tracks if track.misses <= self._max_age]
+            logger.debug("Removed %s expired tracks", len(expired))
+
+        return result
@@ -0,0 +1,135 @@
+import asyncio
+import logging
+import threading
+from typing import Callable, Union
+
+from cltl.backend.source.client_source import ClientImageSource
+from cltl.backend.spi.image import ImageSource
+from cltl.combot.infra.config import ConfigurationManager
+from cltl.combot.infra.event import EventBus
+from cltl.combot.infra.resource import ResourceManager
+from cltl_service.emissordata.client import EmissorDataClient
+from cltl_service.frames.cache import FrameCache
+from cltl_service.metrics.registry import MetricsRegistry
+from objectref.objectloc.api import ObjectReference, AsyncObjectReference, AsyncObjectReferenceAdapter
+from objectref.objectloc.tracking import ObjectTracker
+from objectref_service.objectloc.join import JoinBuffer
+from objectref_service.objectloc.service import ObjectReferenceService, options_from_config
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncObjectReferenceService(ObjectReferenceService):
+    """
+    ObjectReferenceService that drives an :class:`AsyncObjectReference` from an event loop.
+
+    Events are still received on the topic worker thread, but text and images are processed
+    as tasks on a dedicated event loop, such that independent frames and utterances overlap.
+    At most `max_concurrency` tasks are in flight, further events block the topic worker
+    until a task is finished. Replies can therefore be published out of order.
+    """
+
+    @classmethod
+    def from_config(cls, object_reference: Union[ObjectReference, AsyncObjectReference],
+                    emissor_client: EmissorDataClient, event_bus: EventBus, resource_manager: ResourceManager,
+                    config_manager: ConfigurationManager):
+        config = config_manager.get_config("objectref.objectloc")
+        image_topic = config.get("topic_image")
+        object_topic = config.get("topic_object")
+        text_in_topic = config.get("topic_text_in")
+        text_out_topic = config.get("topic_text_out")
+        max_concurrency = config.get_int("max_concurrency") if "max_concurrency" in config else 4
+
+        if isinstance(object_reference, ObjectReference):
+            object_reference = AsyncObjectReferenceAdapter(object_reference)
+
+        def image_loader(url) -> ImageSource:
+            return ClientImageSource.from_config(config_manager, url)
+
+        return cls(image_topic, object_topic, text_in_topic, text_out_topic,
+                   image_loader, object_reference, emissor_client, event_bus, resource_manager,
+                   max_concurrency=max_concurrency, **options_from_config(config, config_manager))
+
+    def __init__(self, image_topic: str, object_topic: str, text_in_topic: str, text_out_topic: str,
+                 image_loader: Callable[[str], ImageSource], object_reference: AsyncObjectReference,
+                 emissor_client: EmissorDataClient, event_bus: EventBus, resource_manager: ResourceManager,
+                 tracker: ObjectTracker = None, join_buffer: JoinBuffer = None, prefetch_workers: int = 2,
+                 frame_cache: FrameCache = None, latest_only: bool = False, metrics: MetricsRegistry = None,
+                 max_concurrency: int = 4):
+        super().__init__(image_topic, object_topic, text_in_topic, text_out_topic,
+                         image_loader, object_reference, emissor_client, event_bus, resource_manager,
+                         tracker=tracker, join_buffer=join_buffer, prefetch_workers=prefetch_workers,
+                         frame_cache=frame_cache, latest_only=latest_only, metrics=metrics)
+
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be positive, was " + str(max_concurrency))
+
+        self._in_flight = threading.BoundedSemaphore(max_concurrency)
+        self._loop = None
+        self._loop_thread = None
+
+    def start(self, timeout=30):
+        self._loop = asyncio.new_event_loop()
+        self._loop_thread = threading.Thread(target=self._loop.run_forever, daemon=True,
+                                             name=self.__class__.__name__ + "-loop")
+        self._loop_thread.start()
+
+        super().start(timeout)
+
+    def stop(self):
+        super().stop()
+
+        pending = asyncio.run_coroutine_threadsafe(self._drain(), self._loop)
+        try:
+            pending.result(timeout=10)
+        except:
+            logger.exception("Failed to finish pending tasks")
+
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._loop_thread.join()
+        self._loop.close()
+        self._loop = None
+        self._loop_thread = None
+
+    def _process_text(self, utterance):
+        self._submit(self._process_text_async(utterance))
+
+    def _process_image(self, image_supplier, objects, changed, observed=None):
+        self._submit(self._process_image_async(image_supplier, objects, changed, observed))
+
+    async def _process_text_async(self, utterance):
+        reply = await self._object_reference.process_utterance(utterance)
+        self._publish_text(reply)
+
+    async def _process_image_async(self, image_supplier, objects, changed, observed=None):
+        loop = asyncio.get_running_loop()
+        image = await loop.run_in_executor(None, image_supplier)
+
+        if changed:
+            await self._object_reference.add_observation(image, changed)
+            if observed:
+                observed()
+        locations = await self._object_reference.get_locations(image, [bbox for _, bbox in objects])
+
+        self._publish_objects(objects, locations)
+
+    def _submit(self, coroutine):
+        self._in_flight.acquire()
+        try:
+            future = asyncio.run_coroutine_threadsafe(coroutine, self._loop)
+        except:
+            self._in_flight.release()
+            coroutine.close()
+            raise
+
+        future.add_done_callback(self._task_done)
+
+    def _task_done(self, future):
+        self._in_flight.release()
+        if not future.cancelled() and future.exception():
+            logger.error("Failed to process event", exc_info=future.exception())
+
+    @staticmethod
+    async def _drain():
+        tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        await asyncio.gather(*tasks, return_exceptions=True)
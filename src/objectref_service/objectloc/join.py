@@ -0,0 +1,149 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Hashable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+_MISSING = object()
+
+
+@dataclass(frozen=True)
+class JoinStatistics:
+    """
+    Counters of a :class:`JoinBuffer`.
+
+    joined: image and detections were matched.
+    expired: an entry did not receive its partner within the TTL.
+    orphaned: an entry was evicted because the buffer was full.
+    superseded: an entry was dropped because a more recent image was matched.
+    pending: entries currently waiting for their partner.
+    unkeyed: detections without image id, not a drop as their image is counted when it expires.
+    """
+    joined: int
+    expired: int
+    orphaned: int
+    superseded: int
+    pending: int
+    unkeyed: int = 0
+
+
+class _Entry:
+    __slots__ = ("image", "objects", "timestamp")
+
+    def __init__(self, timestamp: float):
+        self.image = _MISSING
+        self.objects = _MISSING
+        self.timestamp = timestamp
+
+
+class JoinBuffer:
+    """
+    Match images with the detections for that image by image id.
+
+    Entries wait in the buffer for their partner for at most `ttl` seconds and the
+    buffer holds at most `capacity` unmatched entries, evicting the oldest entry
+    when it is full. Matching is an O(1) lookup, expired entries are removed from
+    the head of the buffer in order of arrival.
+
+    If `supersede` is set, all entries that arrived before a matched entry are dropped
+    when the match is made, such that only frames more recent than the last matched
+    frame are retained.
+    """
+
+    def __init__(self, capacity: int = 32, ttl: float = 10.0, supersede: bool = False,
+                 clock: Callable[[], float] = time.monotonic):
+        if capacity < 1:
+            raise ValueError("capacity must be positive, was " + str(capacity))
+
+        self._capacity = capacity
+        self._ttl = ttl
+        self._supersede = supersede
+        self._clock = clock
+
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self._joined = 0
+        self._expired = 0
+        self._orphaned = 0
+        self._superseded = 0
+        self._unkeyed = 0
+
+    @property
+    def statistics(self) -> JoinStatistics:
+        with self._lock:
+            return JoinStatistics(self._joined, self._expired, self._orphaned, self._superseded,
+                                  len(self._entries), self._unkeyed)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def put_image(self, key: Optional[Hashable], image: Any) -> Optional[Tuple[Any, Any]]:
+        """
+        Add an image.
+
+        Returns
+        -------
+        Optional[Tuple[Any, Any]]
+            The image and its detections if the detections were already available, None otherwise.
+        """
+        return self._put(key, "image", image)
+
+    def put_objects(self, key: Optional[Hashable], objects: Any) -> Optional[Tuple[Any, Any]]:
+        """
+        Add the detections for an image.
+
+        Returns
+        -------
+        Optional[Tuple[Any, Any]]
+            The image and its detections if the image was already available, None otherwise.
+        """
+        return self._put(key, "objects", objects)
+
+    def _put(self, key: Optional[Hashable], slot: str, value: Any) -> Optional[Tuple[Any, Any]]:
+        if key is None:
+            with self._lock:
+                self._unkeyed += 1
+            logger.debug("Ignored %s without image id", slot)
+            return None
+
+        with self._lock:
+            now = self._clock()
+            self._expire(now)
+
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = _Entry(now)
+                self._entries[key] = entry
+                if len(self._entries) > self._capacity:
+                    evicted, _ = self._entries.popitem(last=False)
+                    self._orphaned += 1
+                    logger.debug("Evicted unmatched entry for %s", evicted)
+
+            setattr(entry, slot, value)
+            if entry.image is _MISSING or entry.objects is _MISSING:
+                return None
+
+            if self._supersede:
+                while next(iter(self._entries)) != key:
+                    self._entries.popitem(last=False)
+                    self._superseded += 1
+
+            del self._entries[key]
+            self._joined += 1
+
+            return entry.image, entry.objects
+
+    def _expire(self, now: float):
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            if now - entry.timestamp <= self._ttl:
+                break
+
+            del self._entries[key]
+            self._expired += 1
+            logger.debug("Expired unmatched entry for %s", key)
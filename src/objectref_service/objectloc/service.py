@@ -1,7 +1,11 @@
 import logging
-from collections import OrderedDict
-from typing import Callable
+import threading
+import weakref
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
+from typing import Callable, Optional
 
+from cltl.backend.api.camera import Image
 from cltl.backend.source.client_source import ClientImageSource
 from cltl.backend.spi.image import ImageSource
 from cltl.combot.event.emissor import TextSignalEvent
@@ -12,12 +16,74 @@ from cltl.combot.infra.time_util import timestamp_now
 from cltl.combot.infra.topic_worker import TopicWorker
 from cltl.object_recognition.api import Object
 from cltl_service.emissordata.client import EmissorDataClient
+from cltl_service.frames.cache import FrameCache, shared_frame_cache
+from cltl_service.frames.shedding import LatestWorker
+from cltl_service.metrics.registry import MetricsRegistry, instrumented, shared_metrics
 from emissor.representation.scenario import class_type, TextSignal
 from objectref.objectloc.api import ObjectReference
+from objectref.objectloc.tracking import ObjectTracker
+from objectref_service.objectloc.join import JoinBuffer, JoinStatistics
 
 logger = logging.getLogger(__name__)
 
 
+def tracker_from_config(config) -> Optional[ObjectTracker]:
+    if "tracking" not in config or not config.get_boolean("tracking"):
+        return None
+
+    tracker_config = {key: config.get_float("tracking_" + key)
+                      for key in ("iou_threshold", "moved_threshold") if "tracking_" + key in config}
+    if "tracking_max_age" in config:
+        tracker_config["max_age"] = config.get_int("tracking_max_age")
+
+    return ObjectTracker(**tracker_config)
+
+
+def join_buffer_from_config(config) -> JoinBuffer:
+    join_config = {}
+    if "join_capacity" in config:
+        join_config["capacity"] = config.get_int("join_capacity")
+    if "join_ttl" in config:
+        join_config["ttl"] = config.get_float("join_ttl")
+    if "latest_only" in config:
+        join_config["supersede"] = config.get_boolean("latest_only")
+
+    return JoinBuffer(**join_config)
+
+
+def options_from_config(config, config_manager: ConfigurationManager) -> dict:
+    """
+    Optional constructor arguments of the :class:`ObjectReferenceService` from the configuration.
+    """
+    return {
+        "tracker": tracker_from_config(config),
+        "join_buffer": join_buffer_from_config(config),
+        "prefetch_workers": config.get_int("prefetch_workers") if "prefetch_workers" in config else 2,
+        "frame_cache": shared_frame_cache(config_manager),
+        "latest_only": config.get_boolean("latest_only") if "latest_only" in config else False,
+        "metrics": shared_metrics(),
+    }
+
+
+class _Prefetched:
+    """
+    Supplier of an image that is loaded in the background.
+
+    Holds a prefetch slot until the image is supplied, or until the supplier is dropped
+    together with its frame, e.g. when the frame expires in the join buffer.
+    """
+
+    def __init__(self, future: Future, release: Callable[[], None]):
+        self._future = future
+        self._release = weakref.finalize(self, release)
+
+    def __call__(self) -> Image:
+        try:
+            return self._future.result()
+        finally:
+            self._release()
+
+
 class ObjectReferenceService:
     @classmethod
     def from_config(cls, object_reference: ObjectReference, emissor_client: EmissorDataClient,
@@ -32,35 +98,100 @@ class ObjectReferenceService:
             return ClientImageSource.from_config(config_manager, url)
 
         return cls(image_topic, object_topic, text_in_topic, text_out_topic,
-                   image_loader, object_reference, emissor_client, event_bus, resource_manager)
+                   image_loader, object_reference, emissor_client, event_bus, resource_manager,
+                   **options_from_config(config, config_manager))
 
     def __init__(self, image_topic: str, object_topic: str, text_in_topic: str, text_out_topic: str,
                  image_loader: Callable[[str], ImageSource], object_reference: ObjectReference,
-                 emissor_client: EmissorDataClient, event_bus: EventBus, resource_manager: ResourceManager):
+                 emissor_client: EmissorDataClient, event_bus: EventBus, resource_manager: ResourceManager,
+                 tracker: ObjectTracker = None, join_buffer: JoinBuffer = None, prefetch_workers: int = 2,
+                 frame_cache: FrameCache = None, latest_only: bool = False, metrics: MetricsRegistry = None):
+        """
+        Parameters
+        ----------
+        tracker : ObjectTracker
+            If set, only new or moved objects are added as observation.
+        join_buffer : JoinBuffer
+            Buffer to match images with their detections.
+        prefetch_workers : int
+            Number of threads to load images before their detections arrive, zero disables prefetching.
+            At most this many loaded images wait for their detections, such that prefetching holds at
+            most `prefetch_workers` decoded frames in memory; further images are loaded when their
+            frame is processed.
+        frame_cache : FrameCache
+            Cache for loaded images.
+        latest_only : bool
+            Process frames on a separate thread and drop frames that are superseded by a more
+            recent frame before they are processed.
+        metrics : MetricsRegistry
+            If set, event counts, processing times, queue depths and drops are recorded.
+        """
         self._emissor_client = emissor_client
         self._event_bus = event_bus
         self._resource_manager = resource_manager
 
         self._object_reference = object_reference
         self._image_loader = image_loader
+        self._frame_cache = frame_cache
+        self._tracker = tracker
 
         self._image_topic = image_topic
         self._object_topic = object_topic
         self._text_in_topic = text_in_topic
         self._text_out_topic = text_out_topic
 
-        self._image_cache = OrderedDict()
-        self._object_cache = OrderedDict()
+        self._join_buffer = join_buffer if join_buffer is not None else JoinBuffer()
+
+        self._prefetch_workers = prefetch_workers
+        self._prefetch_executor = None
+        self._prefetch_slots = None
+
+        self._frame_worker = LatestWorker(self._process_frame, name=self.__class__.__name__ + "-frames") \
+            if latest_only else None
+
+        self._metrics = metrics
 
         self._topic_worker = None
 
+    @property
+    def join_statistics(self) -> JoinStatistics:
+        return self._join_buffer.statistics
+
+    @property
+    def dropped_frames(self) -> int:
+        """
+        Number of complete frames that were dropped in favour of a more recent frame.
+        """
+        return self._frame_worker.dropped if self._frame_worker else 0
+
     def start(self, timeout=30):
+        if self._prefetch_workers:
+            self._prefetch_executor = ThreadPoolExecutor(max_workers=self._prefetch_workers,
+                                                         thread_name_prefix=self.__class__.__name__ + "-prefetch")
+            self._prefetch_slots = threading.BoundedSemaphore(self._prefetch_workers)
+        if self._frame_worker:
+            self._frame_worker.start()
+
         self._topic_worker = TopicWorker([self._image_topic, self._object_topic, self._text_in_topic],
-                                         self._event_bus, buffer_size=8, processor=self._process,
+                                         self._event_bus, buffer_size=8,
+                                         processor=instrumented(self._metrics, self.__class__.__name__, self._process),
                                          resource_manager=self._resource_manager,
                                          name=self.__class__.__name__)
+        if self._metrics:
+            self._track_metrics()
         self._topic_worker.start().wait()
 
+    def _track_metrics(self):
+        name = self.__class__.__name__
+
+        self._metrics.track_queue(name, "join", lambda: len(self._join_buffer))
+        self._metrics.track_drops(name, "join_expired", lambda: self.join_statistics.expired)
+        self._metrics.track_drops(name, "join_orphaned", lambda: self.join_statistics.orphaned)
+        self._metrics.track_drops(name, "join_superseded", lambda: self.join_statistics.superseded)
+        if self._frame_worker:
+            self._metrics.track_queue(name, "frames", lambda: self._frame_worker.pending)
+            self._metrics.track_drops(name, "frame_superseded", lambda: self.dropped_frames)
+
     def stop(self):
         if not self._topic_worker:
             pass
@@ -69,70 +200,118 @@ class ObjectReferenceService:
         self._topic_worker.await_stop()
         self._topic_worker = None
 
+        if self._frame_worker:
+            self._frame_worker.stop()
+        if self._prefetch_executor:
+            self._prefetch_executor.shutdown(wait=False)
+            self._prefetch_executor = None
+
     def _process(self, event: Event):
-        image_id = None
+        joined = None
         if event.metadata.topic == self._text_in_topic:
             self._process_text(event.payload.signal.text)
         elif event.metadata.topic == self._image_topic:
-            image_id = self._update_image(event)
+            joined = self._update_image(event)
         elif event.metadata.topic == self._object_topic:
-            image_id = self._update_objects(event)
+            joined = self._update_objects(event)
         else:
             logger.warning("Unhandled event: %s", event)
 
-        if image_id and image_id in self._image_cache and image_id in self._object_cache:
-            self._process_image(image_id)
+        if joined and self._frame_worker:
+            self._frame_worker.submit(joined)
+        elif joined:
+            self._process_frame(joined)
+
+    def _process_frame(self, joined):
+        image_supplier, (objects, tracked) = joined
+
+        if self._tracker:
+            # Tracks are only marked as reported once the frame is observed, frames can be dropped until then
+            tracked = self._tracker.changed(tracked)
+            changed = [(obj.label, obj.bounds) for obj in tracked]
+            self._process_image(image_supplier, objects, changed, partial(self._tracker.report, tracked))
+        else:
+            self._process_image(image_supplier, objects, objects)
 
     def _process_text(self, utterance):
-        # TODO process text and create a reply
         reply = self._object_reference.process_utterance(utterance)
+        self._publish_text(reply)
 
+    def _publish_text(self, text):
         scenario_id = self._emissor_client.get_current_scenario_id()
-        signal = TextSignal.for_scenario(scenario_id, timestamp_now(), timestamp_now(), None, reply)
+        signal = TextSignal.for_scenario(scenario_id, timestamp_now(), timestamp_now(), None, text)
         self._event_bus.publish(self._text_out_topic, Event.for_payload(TextSignalEvent.for_agent(signal)))
 
     def _update_image(self, event):
-        if len(self._image_cache) > 5:
-            self._image_cache.popitem(last=False)
-
         image_id = event.payload.signal.id
-        self._image_cache[image_id] = event.payload.signal.files[0]
+        joined = self._join_buffer.put_image(image_id, self._prefetch(event.payload.signal.files[0]))
 
         logger.debug("Updated image")
 
-        return image_id
+        return joined
 
     def _update_objects(self, event):
-        if len(self._object_cache) > 5:
-            self._object_cache.popitem(last=False)
-
-        # All segments should be in the same image, therefore we just take the first
+        # All segments should be in the same image, therefore we just take the first. Mentions without
+        # object are included, such that the image of a frame without detections is joined as well
         image_id = next((mention.segment[0].container_id
-                    for mention in event.payload.mentions
-                    for annotation in mention.annotations
-                    if annotation.type == class_type(Object) and annotation.value and mention.segment), None)
+                         for mention in event.payload.mentions
+                         if mention.segment), None)
 
-        self._object_cache[image_id] =  [(annotation.value.label, mention.segment[0].bounds)
+        objects = [(annotation.value.label, mention.segment[0].bounds)
                    for mention in event.payload.mentions
                    for annotation in mention.annotations
                    if annotation.type == class_type(Object) and annotation.value and mention.segment]
 
-        logger.debug("Updated image")
+        tracked = self._tracker.update(objects) if self._tracker else None
+
+        # Detections without any mention cannot be matched to their image, the image expires in the join buffer
+        joined = self._join_buffer.put_objects(image_id, (objects, tracked))
+
+        logger.debug("Updated objects")
+
+        return joined
 
-        return image_id
+    def _process_image(self, image_supplier: Callable[[], Image], objects, changed,
+                       observed: Callable[[], None] = None):
+        image = image_supplier()
 
-    def _process_image(self, image_id):
-        image_location = self._image_cache[image_id]
+        # Only new or moved objects are added as observation
+        if changed:
+            self._object_reference.add_observation(image, changed)
+            if observed:
+                observed()
+        locations = self._object_reference.get_locations(image, [bbox for _, bbox in objects])
+
+        self._publish_objects(objects, locations)
+
+    def _prefetch(self, image_location) -> Callable[[], Image]:
+        """
+        Start loading the image in the background while waiting for the detections, if
+        less than `prefetch_workers` prefetched images are waiting.
+
+        Returns
+        -------
+        Callable[[], Image]
+            Supplier of the image, blocks until the image is loaded.
+        """
+        if not self._prefetch_executor or not self._prefetch_slots.acquire(blocking=False):
+            return partial(self._load_image, image_location)
+
+        return _Prefetched(self._prefetch_executor.submit(self._load_image, image_location),
+                           self._prefetch_slots.release)
+
+    def _load_image(self, image_location) -> Image:
+        if self._frame_cache:
+            return self._frame_cache.get(image_location, self._capture_image)
+
+        return self._capture_image(image_location)
+
+    def _capture_image(self, image_location) -> Image:
         with self._image_loader(image_location) as source:
             image = source.capture()
             logger.debug("Loaded image for objects with bounds %s", image.bounds)
 
-        objects = self._object_cache[image_id]
-
-        # TODO Resolve locations and store objects
-        self._object_reference.add_observation(image, objects)
+        return image
 
-        scenario_id = self._emissor_client.get_current_scenario_id()
-        utterance = f"Oh, I see objects: {objects} at locations {[self._object_reference.get_location(image, bbox) for _, bbox in objects]}"
-        signal = TextSignal.for_scenario(scenario_id, timestamp_now(), timestamp_now(), None, utterance)
-        self._event_bus.publish(self._text_out_topic, Event.for_payload(TextSignalEvent.for_agent(signal)))
+    def _publish_objects(self, objects, locations):
+        self._publish_text(f"Oh, I see objects: {objects} at locations {[tuple(location) for location in locations.tolist()]}")